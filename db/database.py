@@ -1,134 +1,310 @@
 """db/database.py — All SQL lives here."""
-import hashlib, random, time
+import asyncio, hashlib, hmac, os, random, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pathlib import Path
 from typing import Optional
 import aiosqlite
 
 SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
-ITEM_SLOTS  = [
+CACHE_TTL   = 10   # seconds a cached leaderboard read stays fresh
+READERS     = 4    # reader threads (one read-only connection each) beside the writer
+ITEM_SLOTS  = (
     "trinket","amulet","idol","cutlass","tricorn",
     "coat","gauntlets","buckler","breeches","sea boots",
-]
+)
+
+# Column sets for player reads. Hot paths take the core set; only the profile
+# page needs penalty counters/timestamps, and only login needs the hash.
+_PLAYER_CORE_COLS = ("id,username,network,class,alignment,level,ttl,next_ttl,pos_x,pos_y,"
+                     "is_online,current_nick,channel,userhost,online_since,last_login,is_admin")
+_PLAYER_PROFILE_COLS = (_PLAYER_CORE_COLS + ",idled,created_at,pen_mesg,pen_nick,pen_part,"
+                        "pen_kick,pen_quit,pen_quest,pen_logout")
+_PLAYER_PROFILE_COLS_P = ",".join("p." + c for c in _PLAYER_PROFILE_COLS.split(","))
+_PLAYER_AUTH_COLS = _PLAYER_CORE_COLS + ",password_hash,password_salt"
+
+# Hot-path statements, kept as constants so sqlite3's statement cache keys on
+# one identical string per query.
+_ITEMS_INSERT_SQL = "INSERT INTO items(player_id,slot,level) VALUES(?,?,0)"
+_SQL_PLAYER_BY_ID = f"SELECT {_PLAYER_CORE_COLS} FROM players WHERE id=?"
+# Exact (username, network) match that still seeks the UNIQUE(username
+# COLLATE NOCASE) autoindex: a plain username=? can't use a NOCASE index.
+_SQL_USER_NET     = "username=? COLLATE NOCASE AND username=? AND network=?"
+_SQL_UPDATE_POS   = "UPDATE players SET pos_x=?,pos_y=? WHERE id=?"
+_SQL_UPDATE_TTL   = "UPDATE players SET ttl=?,idled=idled+? WHERE id=?"
+_BASIC_PENALTY_SQL = "UPDATE players SET ttl=ttl+? WHERE id=?"
+_PENALTY_SQL      = {c: f"UPDATE players SET ttl=ttl+?, {c}={c}+? WHERE id=?"
+                     for c in ("pen_mesg","pen_nick","pen_part","pen_kick",
+                               "pen_quit","pen_quest","pen_logout")}
+_PENALTY_OFFLINE_SQL = {c: f"UPDATE players SET ttl=ttl+?, {c}={c}+?, is_online=0, "
+                          f"current_nick=NULL WHERE id=?"
+                         for c in ("pen_part","pen_kick","pen_quit","pen_logout")}
+_SQL_INSERT_EVENT = ("INSERT INTO events(event_type,message,player1_id,player2_id,created_at) "
+                     "VALUES(?,?,?,?,?)")
+_SQL_SET_ONLINE   = ("UPDATE players SET is_online=1,current_nick=?,channel=?,"
+                     "online_since=strftime('%s','now'),last_login=strftime('%s','now'),"
+                     "userhost=? WHERE id=?")
+
+# Token of the write scope (see Database.transaction) the running task is in.
+# Tasks spawned inside a scope inherit it and so join that scope; each scope
+# gets a fresh token, so a task that outlives its scope is not mistaken for
+# the writer of a later one.
+_WRITE_SCOPE: ContextVar[Optional[object]] = ContextVar("db_write_scope", default=None)
+
+class _WriteBuffer:
+    """Positions, TTLs and events queued for one executemany each."""
+    __slots__ = ("pos", "ttl", "evt")
+
+    def __init__(self):
+        self.pos: list[tuple] = []
+        self.ttl: list[tuple] = []
+        self.evt: list[tuple] = []
+
+    def __bool__(self):
+        return bool(self.pos or self.ttl or self.evt)
+
+    def take(self) -> tuple:
+        out = self.pos, self.ttl, self.evt
+        self.pos, self.ttl, self.evt = [], [], []
+        return out
 
 class Database:
     def __init__(self, path: Path):
         self.path  = path
         self._conn: Optional[aiosqlite.Connection] = None
+        self._read_pool: Optional[ThreadPoolExecutor] = None
+        self._read_local = threading.local()
+        self._read_conns: list[sqlite3.Connection] = []
+        # Buffered writes, flushed with executemany (see flush_ticks): one set
+        # for the open write scope, which its rollback discards, and one for
+        # callers outside it, which is committed on its own
+        self._tx_buf = _WriteBuffer()
+        self._buf    = _WriteBuffer()
+        # Leaderboard cache: key -> (value, expires_at); see _cached()
+        self._cache: dict = {}
+        self._refreshing: set = set()
+        self._bg_tasks: set[asyncio.Task] = set()   # strong refs to running refreshes
+        self._cache_gen = 0
+        # One write scope at a time owns the writer connection; see transaction()
+        self._write_lock = asyncio.Lock()
+        self._scope: Optional[object] = None
 
     async def connect(self):
-        self._conn = await aiosqlite.connect(self.path)
-        self._conn.row_factory = lambda cur, row: dict(zip([c[0] for c in cur.description], row))
+        self._conn = await aiosqlite.connect(self.path, cached_statements=256)
+        self._conn.row_factory = sqlite3.Row   # C-level rows; dict(row) where a real dict is needed
         await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("PRAGMA synchronous=NORMAL")    # WAL-safe, one fsync per checkpoint
+        await self._conn.execute("PRAGMA temp_store=MEMORY")
+        await self._conn.execute("PRAGMA cache_size=-64000")     # ~64 MB page cache
+        await self._conn.execute("PRAGMA mmap_size=268435456")   # 256 MB memory-mapped reads
         await self._conn.execute("PRAGMA foreign_keys=ON")
         await self._conn.executescript(SCHEMA_PATH.read_text())
+        await self._migrate()
         await self._conn.commit()
+        # WAL lets the reader threads query concurrently with the writer
+        self._read_pool = ThreadPoolExecutor(max_workers=READERS, thread_name_prefix="db-read")
+
+    async def _migrate(self):
+        """Add columns introduced after a database was first created."""
+        async with self._conn.execute("PRAGMA table_info(players)") as c:
+            cols = {r["name"] for r in await c.fetchall()}
+        if "password_salt" not in cols:
+            await self._conn.execute("ALTER TABLE players ADD COLUMN password_salt TEXT")
 
     async def close(self):
+        for t in self._bg_tasks: t.cancel()
+        await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+        self._refreshing.clear()   # a task cancelled before it ran never hit its finally
+        if self._conn and not self._write_lock.locked():
+            await self.commit()   # don't drop buffered events/positions
+        if self._read_pool:
+            self._read_pool.shutdown(wait=True)
+            self._read_pool = None
+        for r in self._read_conns: r.close()
+        self._read_conns = []
         if self._conn: await self._conn.close()
 
     @property
     def conn(self): return self._conn
 
+    def _reader(self) -> sqlite3.Connection:
+        """This pool thread's read-only connection, opened on first use."""
+        r = getattr(self._read_local, "conn", None)
+        if r is None:
+            r = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+            r.row_factory = sqlite3.Row
+            r.execute("PRAGMA query_only=ON")
+            r.execute("PRAGMA temp_store=MEMORY")
+            r.execute("PRAGMA cache_size=-16000")
+            r.execute("PRAGMA mmap_size=268435456")
+            self._read_local.conn = r
+            self._read_conns.append(r)
+        return r
+
+    def _sync_read(self, sql, params, one):
+        cur = self._reader().execute(sql, params)
+        try:
+            return cur.fetchone() if one else cur.fetchall()
+        finally:
+            cur.close()
+
+    def _in_scope(self) -> bool:
+        return self._scope is not None and _WRITE_SCOPE.get() is self._scope
+
+    async def _read(self, sql, params, one):
+        # Inside a write scope, read through the writer so callers see their
+        # own uncommitted writes; everyone else reads the last commit.
+        if self._read_pool is None or self._in_scope():
+            async with self._conn.execute(sql, params) as c:
+                return await (c.fetchone() if one else c.fetchall())
+        return await asyncio.get_running_loop().run_in_executor(
+            self._read_pool, self._sync_read, sql, params, one)
+
+    async def _read_one(self, sql, params=()):
+        return await self._read(sql, params, True)
+
+    async def _read_all(self, sql, params=()):
+        return await self._read(sql, params, False)
+
     @staticmethod
-    def hash_password(pw: str) -> str:
-        return hashlib.sha256(pw.encode()).hexdigest()
+    def hash_password(pw: str, salt: str) -> str:
+        """scrypt KDF; deliberately slow, so call it via _hash_async off the loop."""
+        return hashlib.scrypt(pw.encode(), salt=bytes.fromhex(salt),
+                              n=2**14, r=8, p=1, dklen=32).hex()
+
+    @staticmethod
+    def _legacy_hash(pw: str) -> str:
+        return hashlib.new("sha256", pw.encode()).hexdigest()
+
+    async def _hash_async(self, pw: str) -> tuple[str, str]:
+        salt = os.urandom(16).hex()
+        return await asyncio.to_thread(self.hash_password, pw, salt), salt
+
+    async def verify_password(self, player, pw: str) -> bool:
+        """Check pw against a player row. Legacy sha256 hashes are upgraded
+        to scrypt on the first successful login."""
+        salt = player["password_salt"]
+        if salt:
+            digest = await asyncio.to_thread(self.hash_password, pw, salt)
+            return hmac.compare_digest(digest, player["password_hash"])
+        if not hmac.compare_digest(self._legacy_hash(pw), player["password_hash"]):
+            return False
+        await self.change_password(player["id"], pw)
+        return True
 
     # ── Players ───────────────────────────────────────────────────────────────
 
     async def register_player(self, username, network, password,
-                               char_class="Adventurer", alignment="n") -> Optional[int]:
+                               char_class="Adventurer", alignment="n",
+                               online=None) -> Optional[int]:
+        """Create a player and its item rows. Returns None if the name is taken
+        (on any network). online=(nick, channel, userhost) logs the new player
+        in with the same INSERT."""
         pos_x, pos_y = random.randint(0,499), random.randint(0,499)
-        try:
-            async with self.conn.execute(
-                "INSERT INTO players(username,network,password_hash,class,alignment,pos_x,pos_y,ttl,next_ttl)"
-                " VALUES(?,?,?,?,?,?,?,600,600)",
-                (username,network,self.hash_password(password),char_class,alignment,pos_x,pos_y)
-            ) as cur:
-                pid = cur.lastrowid
-            for slot in ITEM_SLOTS:
-                await self.conn.execute(
-                    "INSERT INTO items(player_id,slot,level) VALUES(?,?,0)", (pid,slot))
-            await self.conn.commit()
-            return pid
-        except aiosqlite.IntegrityError:
-            return None
+        pw_hash, salt = await self._hash_async(password)
+        nick, channel, userhost = online or (None, None, None)
+        async with self.transaction():
+            self._invalidate()
+            # Player row + all 10 item rows go in together; the savepoint undoes
+            # just this registration, never other writes in the transaction.
+            await self.conn.execute("SAVEPOINT register")
+            try:
+                async with self.conn.execute(
+                    "INSERT INTO players(username,network,password_hash,password_salt,class,alignment,"
+                    "pos_x,pos_y,ttl,next_ttl,is_online,current_nick,channel,userhost,online_since)"
+                    " VALUES(?,?,?,?,?,?,?,?,600,600,?,?,?,?,"
+                    " CASE WHEN ? THEN strftime('%s','now') END)"
+                    " ON CONFLICT DO NOTHING RETURNING id",
+                    (username,network,pw_hash,salt,char_class,alignment,pos_x,pos_y,
+                     int(online is not None),nick,channel,userhost,int(online is not None))
+                ) as cur:
+                    row = await cur.fetchone()
+                if row is None:   # name taken: nothing was inserted
+                    return None
+                pid = row[0]
+                await self.conn.executemany(_ITEMS_INSERT_SQL, ((pid, s) for s in ITEM_SLOTS))
+                return pid
+            except aiosqlite.IntegrityError:
+                await self.conn.execute("ROLLBACK TO register")
+                return None
+            finally:
+                await self.conn.execute("RELEASE register")
 
     async def get_player(self, username, network):
-        async with self.conn.execute(
-            "SELECT * FROM players WHERE username=? AND network=?", (username,network)
-        ) as c: return await c.fetchone()
+        return await self._read_one(
+            f"SELECT {_PLAYER_CORE_COLS} FROM players WHERE {_SQL_USER_NET}", (username,username,network))
 
     async def get_player_by_id(self, pid):
-        async with self.conn.execute("SELECT * FROM players WHERE id=?", (pid,)) as c:
-            return await c.fetchone()
+        await self._flush_buffers()
+        return await self._read_one(_SQL_PLAYER_BY_ID, (pid,))
 
     # ── Game state & Hall of Fame ────────────────────────────────────────────────
 
     async def get_round(self) -> int:
         try:
-            async with self.conn.execute("SELECT round FROM game_state WHERE id=1") as c:
-                row = await c.fetchone()
+            row = await self._read_one("SELECT round FROM game_state WHERE id=1")
             return row["round"] if row else 1
         except Exception:
             return 1  # table doesn't exist yet — schema not applied
 
     async def record_hof(self, round_num: int, rank: int, p: dict, item_sum: int):
-        await self.conn.execute(
-            "INSERT INTO hall_of_fame (round,rank,username,class,network,level,item_sum) "
-            "VALUES (?,?,?,?,?,?,?)",
-            (round_num, rank, p["username"], p["class"],
-             p["network"], p["level"], item_sum))
-        await self.conn.commit()
+        async with self.transaction():
+            await self.conn.execute(
+                "INSERT INTO hall_of_fame (round,rank,username,class,network,level,item_sum) "
+                "VALUES (?,?,?,?,?,?,?)",
+                (round_num, rank, p["username"], p["class"],
+                 p["network"], p["level"], item_sum))
 
     async def get_hof(self) -> list:
-        async with self.conn.execute(
-            "SELECT * FROM hall_of_fame ORDER BY round DESC, rank ASC") as c:
-            return await c.fetchall()
+        return await self._read_all(
+            "SELECT * FROM hall_of_fame ORDER BY round DESC, rank ASC")
 
     async def reset_round(self):
         """Reset all player stats for a new round. Preserve username, password,
         network, is_admin. Wipe level, TTL, items, penalties, position.
         Login session (is_online, current_nick, online_since, userhost, channel)
         is preserved so players stay logged in across the reset and keep idling."""
-        now = int(__import__('time').time())
-        # Scatter players to random grid positions (0..499, matching MAP_X/MAP_Y
-        # and new-player placement). abs(random())%500 evaluates per-row, so each
-        # player lands on a different tile — otherwise everyone stacks on (0,0)
-        # and the collision-battle logic fires a fight every tick.
-        await self.conn.execute("""
-            UPDATE players SET
-                level=0, ttl=600, next_ttl=600,
-                pos_x=abs(random())%500, pos_y=abs(random())%500, alignment='n',
-                pen_mesg=0, pen_nick=0, pen_part=0,
-                pen_kick=0, pen_quit=0, pen_quest=0, pen_logout=0,
-                idled=0, last_login=?
-            """, (now,))
-        await self.conn.execute("DELETE FROM items")
-        await self.conn.execute("UPDATE game_state SET round=round+1, reset_at=? WHERE id=1", (now,))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            now = int(__import__('time').time())
+            # Scatter players to random grid positions (0..499, matching MAP_X/MAP_Y
+            # and new-player placement). abs(random())%500 evaluates per-row, so each
+            # player lands on a different tile — otherwise everyone stacks on (0,0)
+            # and the collision-battle logic fires a fight every tick.
+            await self.conn.execute("""
+                UPDATE players SET
+                    level=0, ttl=600, next_ttl=600,
+                    pos_x=abs(random())%500, pos_y=abs(random())%500, alignment='n',
+                    pen_mesg=0, pen_nick=0, pen_part=0,
+                    pen_kick=0, pen_quit=0, pen_quest=0, pen_logout=0,
+                    idled=0, last_login=?
+                """, (now,))
+            await self.conn.execute("DELETE FROM items")
+            await self.conn.execute("UPDATE game_state SET round=round+1, reset_at=? WHERE id=1", (now,))
 
     # ── Quest persistence ─────────────────────────────────────────────────────
 
     async def save_quest(self, quest: dict):
         """Persist current quest state to DB singleton row."""
-        questers = quest.get("questers", [])
-        ids = [q["id"] for q in questers] + [None] * 4
-        p1 = quest.get("p1") or (None, None)
-        p2 = quest.get("p2") or (None, None)
-        await self.conn.execute("""
-            UPDATE quest SET
-                active=?, quest_type=?, stage=?, text=?, qtime=?,
-                p1x=?, p1y=?, p1name=?, p2x=?, p2y=?, p2name=?,
-                quester1_id=?, quester2_id=?, quester3_id=?, quester4_id=?
-            WHERE id=1""", (
-            1 if questers else 0,
-            quest.get("type", 1), quest.get("stage", 1),
-            quest.get("text", ""), int(quest.get("qtime", 0)),
-            p1[0], p1[1], quest.get("p1name", ""),
-            p2[0], p2[1], quest.get("p2name", ""),
-            ids[0], ids[1], ids[2], ids[3],
-        ))
-        await self.conn.commit()
+        async with self.transaction():
+            questers = quest.get("questers", [])
+            ids = [q["id"] for q in questers] + [None] * 4
+            p1 = quest.get("p1") or (None, None)
+            p2 = quest.get("p2") or (None, None)
+            await self.conn.execute("""
+                UPDATE quest SET
+                    active=?, quest_type=?, stage=?, text=?, qtime=?,
+                    p1x=?, p1y=?, p1name=?, p2x=?, p2y=?, p2name=?,
+                    quester1_id=?, quester2_id=?, quester3_id=?, quester4_id=?
+                WHERE id=1""", (
+                1 if questers else 0,
+                quest.get("type", 1), quest.get("stage", 1),
+                quest.get("text", ""), int(quest.get("qtime", 0)),
+                p1[0], p1[1], quest.get("p1name", ""),
+                p2[0], p2[1], quest.get("p2name", ""),
+                ids[0], ids[1], ids[2], ids[3],
+            ))
 
     async def load_quest(self) -> dict:
         """Load quest state from DB. Returns empty quest dict if none active."""
@@ -166,199 +342,457 @@ class Database:
 
     async def clear_quest(self):
         """Mark quest as inactive in DB."""
-        await self.conn.execute(
-            "UPDATE quest SET active=0, quester1_id=NULL, quester2_id=NULL,"
-            " quester3_id=NULL, quester4_id=NULL WHERE id=1")
-        await self.conn.commit()
+        async with self.transaction():
+            await self.conn.execute(
+                "UPDATE quest SET active=0, quester1_id=NULL, quester2_id=NULL,"
+                " quester3_id=NULL, quester4_id=NULL WHERE id=1")
 
     async def get_player_by_userhost(self, userhost, network):
         """Find an offline player whose stored userhost matches — for auto-login on JOIN."""
-        async with self.conn.execute(
-            "SELECT * FROM players WHERE userhost=? AND network=? AND is_online=0",
-            (userhost, network)) as c:
-            return await c.fetchone()
+        return await self._read_one(
+            f"SELECT {_PLAYER_CORE_COLS} FROM players WHERE userhost=? AND network=? AND is_online=0",
+            (userhost, network))
 
     async def get_player_by_nick(self, nick, network):
-        async with self.conn.execute(
-            "SELECT * FROM players WHERE current_nick=? AND network=?", (nick,network)
-        ) as c: return await c.fetchone()
+        return await self._read_one(
+            f"SELECT {_PLAYER_CORE_COLS} FROM players WHERE current_nick=? AND network=?", (nick,network))
 
     async def get_online_players(self):
-        async with self.conn.execute("SELECT * FROM players WHERE is_online=1") as c:
-            return await c.fetchall()
-
-    async def get_all_players(self):
-        async with self.conn.execute(
-            "SELECT * FROM players ORDER BY level DESC, ttl ASC") as c:
-            return await c.fetchall()
+        await self._flush_buffers()
+        return await self._read_all(
+            f"SELECT {_PLAYER_CORE_COLS} FROM players WHERE is_online=1")
+
+    async def get_all_players(self, fresh=False):
+        """Leaderboard order. Served from a short-lived cache unless fresh=True."""
+        if fresh: return await self._load_all_players()
+        return await self._cached("all_players", self._load_all_players)
+
+    async def _load_all_players(self):
+        await self._flush_buffers()
+        return await self._read_all(
+            f"SELECT {_PLAYER_CORE_COLS} FROM players ORDER BY level DESC, ttl ASC")
+
+    async def get_top_players(self, n):
+        """First n rows of the leaderboard, walked off idx_players_leaderboard."""
+        await self._flush_buffers()
+        return await self._read_all(
+            f"SELECT {_PLAYER_CORE_COLS} FROM players ORDER BY level DESC, ttl ASC LIMIT ?", (n,))
+
+    async def get_top(self, n=5):
+        """get_top_players plus each row's item sum as "isum", in one query. The
+        correlated SUM runs only for the n rows the LIMIT keeps and is served
+        by idx_items_player_level."""
+        await self._flush_buffers()
+        return await self._read_all(
+            f"SELECT {_PLAYER_CORE_COLS},"
+            f" (SELECT COALESCE(SUM(level),0) FROM items WHERE player_id=players.id) AS isum"
+            f" FROM players ORDER BY level DESC, ttl ASC LIMIT ?", (n,))
 
     async def set_online(self, pid, nick, channel, userhost=""):
-        now = int(time.time())
-        await self.conn.execute(
-            "UPDATE players SET is_online=1,current_nick=?,channel=?,online_since=?,last_login=?,userhost=? WHERE id=?",
-            (nick,channel,now,now,userhost,pid))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(_SQL_SET_ONLINE, (nick,channel,userhost,pid))
+
+    async def set_online_many(self, rows):
+        """rows: iterable of (pid, nick, channel, userhost) — one commit for all."""
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.executemany(
+                _SQL_SET_ONLINE, [(nick,channel,uh,pid) for pid,nick,channel,uh in rows])
 
     async def set_offline(self, pid):
-        await self.conn.execute(
-            "UPDATE players SET is_online=0,current_nick=NULL WHERE id=?", (pid,))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE players SET is_online=0,current_nick=NULL WHERE id=?", (pid,))
 
     async def mark_all_offline(self, network):
-        await self.conn.execute(
-            "UPDATE players SET is_online=0 WHERE network=?", (network,))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE players SET is_online=0 WHERE network=? AND is_online=1", (network,))
 
-    async def get_previously_online(self, network):
-        async with self.conn.execute(
-            "SELECT * FROM players WHERE network=? AND is_online=1 AND userhost IS NOT NULL AND userhost!=''",
-            (network,)
-        ) as c: return await c.fetchall()
+    async def get_previously_online(self, network) -> dict:
+        """{userhost: username} for players left online on network — just the
+        two columns the JOIN-time WHO auto-login needs."""
+        return dict(await self._read_all(
+            "SELECT userhost,username FROM players"
+            " WHERE network=? AND is_online=1 AND userhost IS NOT NULL AND userhost!=''",
+            (network,)))
 
     async def update_nick(self, pid, nick):
-        await self.conn.execute("UPDATE players SET current_nick=? WHERE id=?", (nick,pid))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute("UPDATE players SET current_nick=? WHERE id=?", (nick,pid))
 
-    async def update_position(self, pid, x, y):
-        await self.conn.execute("UPDATE players SET pos_x=?,pos_y=? WHERE id=?", (x,y,pid))
+    def _buffer(self) -> _WriteBuffer:
+        return self._tx_buf if self._in_scope() else self._buf
 
-    async def update_ttl(self, pid, ttl):
-        await self.conn.execute("UPDATE players SET ttl=? WHERE id=?", (max(0,ttl),pid))
+    async def update_position(self, pid, x, y):
+        """Buffered — written by the next flush_ticks()/commit()."""
+        self._buffer().pos.append((x,y,pid))
+
+    async def update_ttl(self, pid, ttl, idled=0):
+        """Buffered — written by the next flush_ticks()/commit()."""
+        self._buffer().ttl.append((max(0,ttl),idled,pid))
+
+    async def update_ttl_bulk(self, pairs, idled=0):
+        """pairs: iterable of (pid, ttl). Written now with one executemany."""
+        async with self.transaction():
+            await self._flush_buffers()
+            await self.conn.executemany(
+                _SQL_UPDATE_TTL, [(max(0,ttl),idled,pid) for pid,ttl in pairs])
+
+    async def scale_ttl(self, pids, factor):
+        """ttl = int(ttl*factor) for every pid, in one UPDATE reading the current TTL."""
+        async with self.transaction():
+            pids = list(pids)
+            if not pids: return
+            await self._flush_buffers()
+            await self.conn.execute(
+                f"UPDATE players SET ttl=CAST(ttl*? AS INTEGER) "
+                f"WHERE id IN ({','.join('?' * len(pids))})", (factor, *pids))
+
+    async def update_positions_bulk(self, rows):
+        """rows: iterable of (pid, x, y). Written now with one executemany."""
+        async with self.transaction():
+            await self._flush_buffers()
+            await self.conn.executemany(_SQL_UPDATE_POS, [(x,y,pid) for pid,x,y in rows])
+
+    async def _flush_buffers(self):
+        """Make the open write scope's buffered writes visible to its next
+        statement. Outside a scope this is a no-op, so reads never wait on the
+        writer: rows buffered there are committed by the caller's commit()
+        or flush_ticks(), or when the next transaction() begins."""
+        if self._in_scope():
+            await self._write_buffer(self._tx_buf)
+
+    async def _write_buffer(self, buf: _WriteBuffer):
+        if not buf: return
+        pos, ttl, evt = buf.take()
+        if pos: await self.conn.executemany(_SQL_UPDATE_POS, pos)
+        if ttl: await self.conn.executemany(_SQL_UPDATE_TTL, ttl)
+        if evt: await self.conn.executemany(_SQL_INSERT_EVENT, evt)
+
+    async def flush_ticks(self):
+        """Write buffered positions/TTLs/events in one transaction."""
+        if self._in_scope():
+            await self._write_buffer(self._tx_buf)
+        elif self._buf:
+            async with self.transaction():
+                pass
 
     async def add_penalty(self, pid, seconds, col=None):
-        """Add seconds to TTL. If col is given (e.g. 'pen_mesg'), also update that counter."""
-        if col and col in ("pen_mesg","pen_nick","pen_part","pen_kick",
-                           "pen_quit","pen_quest","pen_logout"):
-            await self.conn.execute(
-                f"UPDATE players SET ttl=ttl+?, {col}={col}+? WHERE id=?",
-                (max(0,seconds), max(0,seconds), pid))
-        else:
-            await self.conn.execute(
-                "UPDATE players SET ttl=ttl+? WHERE id=?", (max(0,seconds),pid))
-        await self.conn.commit()
+        """Add seconds to TTL. If col is given (e.g. 'pen_mesg'), also update that counter.
+        Returns the new TTL (None if no such player)."""
+        async with self.transaction():
+            await self._flush_buffers()
+            seconds = max(0,seconds)
+            sql     = _PENALTY_SQL.get(col) if col else None
+            if sql:
+                args = (seconds, seconds, pid)
+            else:
+                sql, args = _BASIC_PENALTY_SQL, (seconds,pid)
+            async with self.conn.execute(sql + " RETURNING ttl", args) as c:
+                row = await c.fetchone()
+        return row[0] if row else None
+
+    async def add_penalties(self, rows, col=None):
+        """rows: iterable of (pid, seconds). add_penalty for many players in one executemany."""
+        async with self.transaction():
+            await self._flush_buffers()
+            sql = _PENALTY_SQL.get(col) if col else None
+            if sql:
+                args = [(max(0,sec), max(0,sec), pid) for pid, sec in rows]
+            else:
+                sql, args = _BASIC_PENALTY_SQL, [(max(0,sec), pid) for pid, sec in rows]
+            await self.conn.executemany(sql, args)
+
+    async def penalize_and_offline(self, pid, seconds, col):
+        """add_penalty(pid, seconds, col) + set_offline(pid) in one UPDATE."""
+        async with self.transaction():
+            self._invalidate()
+            await self._flush_buffers()
+            seconds = max(0,seconds)
+            await self.conn.execute(_PENALTY_OFFLINE_SQL[col], (seconds, seconds, pid))
 
     async def level_up(self, pid, new_level, new_ttl):
-        await self.conn.execute(
-            "UPDATE players SET level=?,ttl=?,next_ttl=? WHERE id=?",
-            (new_level,new_ttl,new_ttl,pid))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self._flush_buffers()
+            await self.conn.execute(
+                "UPDATE players SET level=?,ttl=?,next_ttl=? WHERE id=?",
+                (new_level,new_ttl,new_ttl,pid))
 
     # ── Items ─────────────────────────────────────────────────────────────────
 
     async def get_items(self, pid):
-        async with self.conn.execute(
-            "SELECT * FROM items WHERE player_id=? ORDER BY slot", (pid,)) as c:
-            return await c.fetchall()
+        # ORDER BY slot costs no sort step: the UNIQUE(player_id, slot) autoindex
+        # already returns a player's rows in slot order.
+        return await self._read_all(
+            "SELECT * FROM items WHERE player_id=? ORDER BY slot", (pid,))
+
+    async def get_items_by_slot(self, pid) -> dict:
+        """{slot: level} for one player — no name/is_unique columns."""
+        return dict(await self._read_all(
+            "SELECT slot,level FROM items WHERE player_id=?", (pid,)))
 
     async def get_item_sum(self, pid) -> int:
-        async with self.conn.execute(
-            "SELECT COALESCE(SUM(level),0) as t FROM items WHERE player_id=?", (pid,)) as c:
-            row = await c.fetchone()
-            return row["t"] if row else 0
+        row = await self._read_one(
+            "SELECT COALESCE(SUM(level),0) as t FROM items WHERE player_id=?", (pid,))
+        return row["t"] if row else 0
+
+    async def get_item_sums(self, ids=None) -> dict:
+        """{player_id: item sum} for ids (all players if None) in one query."""
+        if ids is None:
+            rows = await self._read_all(
+                "SELECT player_id,SUM(level) FROM items GROUP BY player_id")
+        else:
+            ids = list(ids)
+            if not ids: return {}
+            rows = await self._read_all(
+                f"SELECT player_id,SUM(level) FROM items"
+                f" WHERE player_id IN ({','.join('?'*len(ids))}) GROUP BY player_id", ids)
+        return dict(rows)
 
     async def get_highest_item_sum(self) -> int:
-        async with self.conn.execute(
-            "SELECT COALESCE(MAX(s.t),0) as m FROM (SELECT SUM(level) as t FROM items GROUP BY player_id) s"
-        ) as c:
-            row = await c.fetchone()
-            return row["m"] if row else 0
+        return await self._cached("highest_item_sum", self._load_highest_item_sum)
+
+    async def _load_highest_item_sum(self) -> int:
+        row = await self._read_one(
+            "SELECT COALESCE(MAX(total),0) as m"
+            " FROM (SELECT SUM(level) as total FROM items GROUP BY player_id)")
+        return row["m"] if row else 0
 
     async def set_item(self, pid, slot, level, name=None, is_unique=False):
-        await self.conn.execute(
-            "UPDATE items SET level=?,name=?,is_unique=? WHERE player_id=? AND slot=?",
-            (level,name,int(is_unique),pid,slot))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE items SET level=?,name=?,is_unique=? WHERE player_id=? AND slot=?",
+                (level,name,int(is_unique),pid,slot))
 
     async def steal_item(self, winner_id, loser_id):
-        w = {r["slot"]:r for r in await self.get_items(winner_id)}
-        l = {r["slot"]:r for r in await self.get_items(loser_id)}
-        candidates = [s for s in ITEM_SLOTS if l[s]["level"] > w[s]["level"]]
-        if not candidates: return None
-        slot  = random.choice(candidates)
-        w_lvl = w[slot]["level"]
-        l_lvl = l[slot]["level"]
-        await self.conn.execute(
-            "UPDATE items SET level=?,name=NULL,is_unique=0 WHERE player_id=? AND slot=?",
-            (l_lvl,winner_id,slot))
-        await self.conn.execute(
-            "UPDATE items SET level=?,name=NULL,is_unique=0 WHERE player_id=? AND slot=?",
-            (w_lvl,loser_id,slot))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            async with self.conn.execute(
+                "SELECT player_id,slot,level FROM items WHERE player_id IN (?,?)",
+                (winner_id,loser_id)) as c:
+                rows = await c.fetchall()
+            w = {r["slot"]:r["level"] for r in rows if r["player_id"] == winner_id}
+            l = {r["slot"]:r["level"] for r in rows if r["player_id"] == loser_id}
+            candidates = [s for s in ITEM_SLOTS if l.get(s,0) > w.get(s,0)]
+            if not candidates: return None
+            slot  = random.choice(candidates)
+            w_lvl = w.get(slot,0)
+            l_lvl = l[slot]
+            await self.conn.execute(
+                "UPDATE items SET level=CASE player_id WHEN ? THEN ? WHEN ? THEN ? END,"
+                " name=NULL,is_unique=0 WHERE slot=? AND player_id IN (?,?)",
+                (winner_id,l_lvl,loser_id,w_lvl,slot,winner_id,loser_id))
         return slot, l_lvl, w_lvl
 
     async def modify_item_level(self, pid, slot, delta_pct):
-        async with self.conn.execute(
-            "SELECT level FROM items WHERE player_id=? AND slot=?", (pid,slot)) as c:
-            row = await c.fetchone()
-        if not row or row["level"] == 0: return
-        await self.conn.execute(
-            "UPDATE items SET level=? WHERE player_id=? AND slot=?",
-            (max(0, round(row["level"]*(1+delta_pct))), pid, slot))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            # level>0 replaces the old read-then-skip guard; +0.5 rounds half-up
+            await self.conn.execute(
+                "UPDATE items SET level=MAX(0, CAST(level*(1+?)+0.5 AS INTEGER))"
+                " WHERE player_id=? AND slot=? AND level>0",
+                (delta_pct, pid, slot))
 
     # ── Events ────────────────────────────────────────────────────────────────
 
     async def log_event(self, event_type, message, p1=None, p2=None):
-        await self.conn.execute(
-            "INSERT INTO events(event_type,message,player1_id,player2_id) VALUES(?,?,?,?)",
-            (event_type,message,p1,p2))
-        await self.conn.commit()
+        """Buffered like update_ttl — rows land with the next flush/commit (at
+        the latest the next tick), stamped with the time they were logged."""
+        self._buffer().evt.append((event_type,message,p1,p2,int(time.time())))
 
     async def get_recent_events(self, limit=50):
-        async with self.conn.execute(
-            "SELECT * FROM events ORDER BY created_at DESC LIMIT ?", (limit,)) as c:
-            return await c.fetchall()
+        """(event_type, message, created_at) rows, newest first."""
+        return await self._read_all(
+            "SELECT event_type,message,created_at FROM events"
+            " ORDER BY created_at DESC LIMIT ?", (limit,))
 
     # ── Admin ─────────────────────────────────────────────────────────────────
 
     async def change_password(self, pid, pw):
-        await self.conn.execute(
-            "UPDATE players SET password_hash=? WHERE id=?", (self.hash_password(pw),pid))
-        await self.conn.commit()
+        pw_hash, salt = await self._hash_async(pw)   # before taking the writer
+        async with self.transaction():
+            await self.conn.execute(
+                "UPDATE players SET password_hash=?,password_salt=? WHERE id=?",
+                (pw_hash, salt, pid))
+
+    async def set_userhost(self, pid, userhost):
+        async with self.transaction():
+            await self.conn.execute(
+                "UPDATE players SET userhost=? WHERE id=?", (userhost, pid))
 
     async def set_alignment(self, pid, alignment_char):
-        await self.conn.execute(
-            "UPDATE players SET alignment=? WHERE id=?", (alignment_char,pid))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE players SET alignment=? WHERE id=?", (alignment_char,pid))
 
     async def delete_player(self, pid):
-        await self.conn.execute("DELETE FROM players WHERE id=?", (pid,))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute("DELETE FROM players WHERE id=?", (pid,))
 
     async def delete_old_accounts(self, days) -> int:
-        cutoff = int(time.time()) - int(days*86400)
-        async with self.conn.execute(
-            "SELECT COUNT(*) as n FROM players WHERE is_online=0 AND last_login<?", (cutoff,)) as c:
-            row = await c.fetchone()
-            count = row["n"] if row else 0
-        await self.conn.execute(
-            "DELETE FROM players WHERE is_online=0 AND last_login<?", (cutoff,))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self._flush_buffers()
+            cutoff = int(time.time()) - int(days*86400)
+            async with self.conn.execute(
+                "DELETE FROM players WHERE is_online=0 AND last_login<?", (cutoff,)) as c:
+                count = c.rowcount
         return count
 
     async def set_admin(self, username, is_admin):
-        await self.conn.execute(
-            "UPDATE players SET is_admin=? WHERE username=?", (int(is_admin),username))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE players SET is_admin=? WHERE username=? COLLATE NOCASE AND username=?",
+                (int(is_admin),username,username))
 
     async def update_username(self, pid, new_username):
-        await self.conn.execute(
-            "UPDATE players SET username=? WHERE id=?", (new_username, pid))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE players SET username=? WHERE id=?", (new_username, pid))
 
     async def update_class(self, pid, new_class):
-        await self.conn.execute(
-            "UPDATE players SET class=? WHERE id=?", (new_class,pid))
-        await self.conn.commit()
+        async with self.transaction():
+            self._invalidate()
+            await self.conn.execute(
+                "UPDATE players SET class=? WHERE id=?", (new_class,pid))
+
+    # ── Read cache ────────────────────────────────────────────────────────────
+
+    async def _cached(self, key, loader, ttl=CACHE_TTL):
+        """Stale-while-revalidate: a fresh hit is returned as-is; a stale hit
+        is returned immediately while one background task reloads it."""
+        hit = self._cache.get(key)
+        now = time.monotonic()
+        if hit and now < hit[1]:
+            return hit[0]
+        if hit and now < hit[1] + ttl:
+            if key not in self._refreshing:
+                self._refreshing.add(key)
+                task = asyncio.create_task(self._refresh(key, loader, ttl))
+                self._bg_tasks.add(task)   # the loop only holds a weak reference
+                task.add_done_callback(self._bg_tasks.discard)
+            return hit[0]
+        value = await loader()
+        self._cache[key] = (value, time.monotonic() + ttl)
+        return value
+
+    async def _refresh(self, key, loader, ttl):
+        gen = self._cache_gen
+        try:
+            value = await loader()
+            if gen == self._cache_gen:   # drop results that raced a write
+                self._cache[key] = (value, time.monotonic() + ttl)
+        finally:
+            self._refreshing.discard(key)
+
+    def _invalidate(self):
+        self._cache.clear()
+        self._cache_gen += 1
 
     async def commit(self):
-        """Explicit commit — call after bulk updates."""
-        await self.conn.commit()
+        """Explicit commit — call after bulk updates. Flushes tick buffers first.
+        Deferred to the end of the block when inside transaction()."""
+        if self._in_scope():
+            await self._write_buffer(self._tx_buf)
+        else:
+            async with self.transaction():
+                pass
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Group many mutator calls into one commit:
+
+            async with db.transaction():
+                ...
+
+        Every mutator runs in one of these. A block owns the writer until it
+        commits on exit or rolls back on error; blocks opened by the same task
+        (or tasks it spawns) inside it join it, and blocks from other tasks
+        wait for it, so a rollback only ever undoes the owner's own writes."""
+        if self._in_scope():
+            yield self
+            return
+        async with self._write_lock:
+            self._scope = scope = object()
+            token = _WRITE_SCOPE.set(scope)
+            try:
+                # Writes buffered outside any scope (or made straight on .conn)
+                # are committed on their own, never folded into this block
+                if self._buf or self.conn.in_transaction:
+                    await self._write_buffer(self._buf)
+                    await self.conn.commit()
+                await self.conn.execute("BEGIN")
+                try:
+                    yield self
+                except BaseException:
+                    self._tx_buf.take()
+                    await self.conn.rollback()
+                    self._invalidate()
+                    raise
+                await self._write_buffer(self._tx_buf)
+                await self.conn.commit()
+                # Rows buffered outside while this block held the writer go
+                # out now, in their own commit, rather than at the next block
+                if self._buf:
+                    await self._write_buffer(self._buf)
+                    await self.conn.commit()
+            finally:
+                _WRITE_SCOPE.reset(token)
+                self._scope = None
 
     async def get_player_any_network(self, username: str):
         """Look up a player by username across all networks (global uniqueness)."""
-        async with self.conn.execute(
-            "SELECT * FROM players WHERE username=? COLLATE NOCASE LIMIT 1",
-            (username,)
-        ) as c:
-            return await c.fetchone()
+        return await self._read_one(
+            f"SELECT {_PLAYER_PROFILE_COLS} FROM players WHERE username=? COLLATE NOCASE LIMIT 1",
+            (username,))
+
+    async def get_player_with_items(self, username: str):
+        """Profile row plus {slot: {"level", "name"}} in one round trip, or
+        (None, {}). Item columns are aliased so they can't shadow the player's."""
+        rows = await self._read_all(
+            f"SELECT {_PLAYER_PROFILE_COLS_P},i.slot AS item_slot,i.level AS item_level,"
+            "i.name AS item_name FROM players p LEFT JOIN items i ON i.player_id=p.id "
+            "WHERE p.username=? COLLATE NOCASE", (username,))
+        if not rows: return None, {}
+        items = {r["item_slot"]: {"level": r["item_level"], "name": r["item_name"]}
+                 for r in rows if r["item_slot"]}
+        return rows[0], items
+
+    async def try_login(self, username, network, password, nick, channel, userhost=""):
+        """Look up, verify and mark online in one call. Returns (status, row)
+        with status one of "ok", "nouser", "badpass", "online". The UPDATE only
+        matches an offline row, so two racing logins cannot both succeed."""
+        p = await self.get_player_auth(username, network)
+        if not p:
+            return "nouser", None
+        if not await self.verify_password(p, password):
+            return "badpass", p
+        async with self.transaction():
+            self._invalidate()
+            async with self.conn.execute(
+                _SQL_SET_ONLINE + " AND is_online=0", (nick,channel,userhost,p["id"])) as c:
+                ok = c.rowcount
+        return ("ok" if ok else "online"), p
+
+    async def get_player_auth(self, username: str, network=None):
+        """Core columns plus password hash/salt — for the login path only.
+        Prefers the account on network, then falls back to any network."""
+        if network:
+            row = await self._read_one(
+                f"SELECT {_PLAYER_AUTH_COLS} FROM players WHERE {_SQL_USER_NET}",
+                (username,username,network))
+            if row: return row
+        return await self._read_one(
+            f"SELECT {_PLAYER_AUTH_COLS} FROM players WHERE username=? COLLATE NOCASE LIMIT 1",
+            (username,))
@@ -6,6 +6,7 @@ CREATE TABLE IF NOT EXISTS players (
     username        TEXT    NOT NULL,
     network         TEXT    NOT NULL,
     password_hash   TEXT    NOT NULL,
+    password_salt   TEXT,             -- NULL = legacy unsalted sha256 hash
     is_admin        INTEGER NOT NULL DEFAULT 0,
     is_online       INTEGER NOT NULL DEFAULT 0,
     current_nick    TEXT,
@@ -54,10 +55,19 @@ CREATE TABLE IF NOT EXISTS events (
     created_at  INTEGER NOT NULL DEFAULT (strftime('%s','now'))
 );
 
-CREATE INDEX IF NOT EXISTS idx_players_online  ON players(is_online);
+DROP INDEX IF EXISTS idx_players_online;   -- superseded by the partial index below
+CREATE INDEX IF NOT EXISTS idx_players_online_only ON players(is_online) WHERE is_online=1;
+-- username=? AND network=? uses the username autoindex; UNIQUE(username COLLATE
+-- NOCASE) already makes (username, network) unique, so no extra index is kept.
+DROP INDEX IF EXISTS idx_players_user_net;
+CREATE INDEX IF NOT EXISTS idx_players_nick_net    ON players(current_nick, network);
+CREATE INDEX IF NOT EXISTS idx_players_leaderboard ON players(level DESC, ttl ASC);
+-- username=? COLLATE NOCASE is already served by the UNIQUE(username COLLATE NOCASE) autoindex.
 CREATE INDEX IF NOT EXISTS idx_players_network ON players(network);
 CREATE INDEX IF NOT EXISTS idx_players_pos     ON players(pos_x, pos_y);
+CREATE INDEX IF NOT EXISTS idx_players_offline_last ON players(is_online, last_login);
 CREATE INDEX IF NOT EXISTS idx_events_time     ON events(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_items_player_level ON items(player_id, level);  -- covering for item sums
 
 CREATE TABLE IF NOT EXISTS quest (
     id          INTEGER PRIMARY KEY CHECK(id=1),  -- singleton row
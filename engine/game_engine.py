@@ -1,38 +1,106 @@
 # pylint: disable=E1136
 """engine/game_engine.py — Core IdleRPG game logic."""
-import logging, random, time
-from dataclasses import dataclass
+import bisect, logging, math, random, time
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
 from db.database import Database, ITEM_SLOTS
 
 log = logging.getLogger(__name__)
 
 MAP_X, MAP_Y         = 500, 500
+_STEPS               = (-1, 0, 1)   # random-walk delta per axis
+# Bound once: skips the module attribute lookup on every roll. These are
+# methods of random's shared instance, so random.seed() still applies.
+_rand, _randint, _randrange, _choice = (random.random, random.randint,
+                                        random.randrange, random.choice)
 RP_BASE, RP_STEP     = 600, 1.21
 RP_PEN_STEP          = 1.14   # used only for penalty calculation
 
 
+_BASE_TTL = tuple(int(RP_BASE * (RP_STEP ** l)) for l in range(61))
+
 def base_ttl(level: int) -> int:
     if level > 60:
         return int(RP_BASE * (RP_STEP ** 60) + 86400 * (level - 60))
+    if level >= 0:
+        return _BASE_TTL[level]
     return int(RP_BASE * (RP_STEP ** level))
 
 
+_EVENT_BASE = {"nick": 30, "part": 200, "quit": 20, "logout": 20, "kick": 250,
+               "quest": 15}   # quest: realm-wide penalty when a quester fails
+_PEN_MULT   = [RP_PEN_STEP ** i for i in range(200)]   # RP_PEN_STEP**level lookup
+
 def calc_penalty(event: str, level: int, msg_len: int = 0, limit_pen: int = 0) -> int:
-    base = {"nick": 30, "part": 200, "quit": 20,
-            "logout": 20, "kick": 250}.get(event, msg_len)
-    pen  = int(base * (RP_PEN_STEP ** level))
+    base = _EVENT_BASE.get(event, msg_len)
+    mult = _PEN_MULT[level] if 0 <= level < 200 else RP_PEN_STEP ** level
+    pen  = int(base * mult)
     return min(pen, limit_pen) if limit_pen else pen
 
 
 # ── Broadcasts ────────────────────────────────────────────────────────────────
-@dataclass
+@dataclass(slots=True)
 class Broadcast:
     scope:   str            # 'all' | 'network' | 'notice'
     network: Optional[str]
     message: str
     nick:    Optional[str] = None
 
+# ── Per-tick snapshot ─────────────────────────────────────────────────────────
+@dataclass(slots=True)
+class Player:
+    """Mutable player snapshot (the players core columns). Tick code uses
+    attribute access; p["col"] still works so snapshots can be handed to
+    helpers that also take DB rows (utag, resolve_battle, events)."""
+    id:           int
+    username:     str
+    network:      str
+    class_:       str
+    alignment:    str
+    level:        int
+    ttl:          int
+    next_ttl:     int
+    pos_x:        int
+    pos_y:        int
+    is_online:    int
+    current_nick: Optional[str]
+    channel:      Optional[str]
+    userhost:     Optional[str]
+    online_since: Optional[int]
+    last_login:   Optional[int]
+    is_admin:     int
+
+    @classmethod
+    def from_row(cls, r) -> "Player":
+        return cls(**{_PLAYER_ATTR.get(k, k): r[k] for k in r.keys()})
+
+    def __getitem__(self, key):
+        return getattr(self, _PLAYER_ATTR.get(key, key))
+
+    def __setitem__(self, key, value):
+        setattr(self, _PLAYER_ATTR.get(key, key), value)
+
+_PLAYER_ATTR = {"class": "class_"}   # column name -> attribute (keyword clash)
+
+@dataclass
+class TickContext:
+    """Online players read once per tick, as Player snapshots. Tick helpers
+    read from and update these in place instead of re-querying the DB."""
+    online: list
+    by_id:  dict = field(default_factory=dict)
+    good:   list = field(default_factory=list)   # alignment partitions, built
+    evil:   list = field(default_factory=list)   # in the same pass as by_id
+
+    @classmethod
+    def from_rows(cls, rows) -> "TickContext":
+        ctx = cls([Player.from_row(r) for r in rows])
+        for p in ctx.online:
+            ctx.by_id[p.id] = p
+            if   p.alignment == "g": ctx.good.append(p)
+            elif p.alignment == "e": ctx.evil.append(p)
+        return ctx
+
 def broadcast_all(msg: str)                        -> Broadcast: return Broadcast("all",    None, msg)
 def broadcast_net(net: str, msg: str)              -> Broadcast: return Broadcast("network", net,  msg)
 def broadcast_notice(net, nick, msg)               -> Broadcast: return Broadcast("notice",  net,  msg, nick)
@@ -46,18 +114,16 @@ def utag(p) -> str:
     return f"{p['username']}@{p['network']}"
 
 def fmt_time(seconds: int) -> str:
-    s = abs(int(seconds))
-    d, s = divmod(s, 86400)
-    h, s = divmod(s, 3600)
-    m, s = divmod(s, 60)
-    return f"{d} day{'s' if d != 1 else ''}, {h:02d}:{m:02d}:{s:02d}"
+    return _fmt_secs(abs(int(seconds)))
+
+@lru_cache(maxsize=4096)
+def _fmt_secs(s: int) -> str:
+    d, r = s // 86400, s % 86400
+    return f"{d} day{'' if d == 1 else 's'}, {r // 3600:02d}:{r // 60 % 60:02d}:{r % 60:02d}"
 
 # ── Items ─────────────────────────────────────────────────────────────────────
-ITEM_SLOT_NAMES = [
-    "trinket", "amulet", "idol", "cutlass", "tricorn",
-    "coat", "gauntlets", "buckler", "breeches", "sea boots",
-]
-UNIQUE_ITEMS = [
+ITEM_SLOT_NAMES = ITEM_SLOTS   # one shared tuple: random.choice indexes it directly
+UNIQUE_ITEMS = (
     ("The Admiral's Grand Tricorn",            "tricorn",        50,  74, 25),
     ("Davy Jones' Cursed Trinket",             "trinket",        50,  74, 25),
     ("The Kraken Hunter's Coat",               "coat",           75,  99, 30),
@@ -66,7 +132,7 @@ UNIQUE_ITEMS = [
     ("The Dead Man's Cutlass of Ruin",         "cutlass",       175, 200, 45),
     ("Navigator's Enchanted Sea Boots",        "sea boots",     250, 300, 48),
     ("The Cannon of Doom",                      "cutlass",       300, 350, 52),
-]
+)
 UNIQUE_MSGS = {
     "The Admiral's Grand Tricorn":
         "The seas part and fortune smiles upon you! You found the level {lvl} Admiral's Grand Tricorn! Your enemies flee at the sight of your authority.",
@@ -86,17 +152,42 @@ UNIQUE_MSGS = {
         "An impossibly large cannon washes up beside you! You found the level {lvl} Cannon of Doom! Your enemies scatter as you light the fuse.",
 }
 
+# Per-level pass chance for non-unique item rolls: 1 / 1.4**(num/4)
+_ITEM_ROLL_MAX = 1000
+_ITEM_THRESH   = [1.0] + [1 / (1.4 ** (num / 4)) for num in range(1, _ITEM_ROLL_MAX + 1)]
+
+# _ITEM_LOGSURV[k] = sum(log(1 - p_i) for i in k.._ITEM_ROLL_MAX), ascending in k.
+# P(no trial in k..M passes) = exp(_ITEM_LOGSURV[k] - _ITEM_LOGSURV[M+1]).
+_ITEM_LOGSURV = [0.0] * (_ITEM_ROLL_MAX + 2)
+for _k in range(_ITEM_ROLL_MAX, 0, -1):
+    _ITEM_LOGSURV[_k] = _ITEM_LOGSURV[_k + 1] + math.log1p(-_ITEM_THRESH[_k])
+del _k
+
+def _roll_level(max_level: int) -> int:
+    """Highest num in 1..max_level whose Bernoulli trial passes (1 if none).
+
+    Sampled by inverting the closed-form CDF P(level <= k) =
+    prod(1 - p_i for i in k+1..max_level) with one uniform draw and a
+    bisect, instead of running max_level separate trials."""
+    if max_level > _ITEM_ROLL_MAX:
+        level = 1
+        for num in range(1, max_level + 1):
+            if _rand() < 1 / (1.4 ** (num / 4)):
+                level = num
+        return level
+    if max_level < 2:
+        return 1
+    u      = 1.0 - _rand()    # (0, 1]
+    target = math.log(u) + _ITEM_LOGSURV[max_level + 1]
+    return bisect.bisect_left(_ITEM_LOGSURV, target, 2, max_level + 2) - 1
+
 def roll_item(player_level: int) -> tuple:
     if player_level >= 25:
         for name, slot, min_l, max_l, req in UNIQUE_ITEMS:
-            if player_level >= req and random.random() < 1/40:
-                return slot, random.randint(min_l, max_l - 1), name, True
-    max_level = int(player_level * 1.5)
-    level = 1
-    for num in range(1, max_level + 1):
-        if random.random() < 1 / (1.4 ** (num / 4)):
-            level = num
-    return random.choice(ITEM_SLOT_NAMES), level, None, False
+            if player_level >= req and _rand() < 1/40:
+                return slot, _randint(min_l, max_l - 1), name, True
+    level = _roll_level(int(player_level * 1.5))
+    return _choice(ITEM_SLOT_NAMES), level, None, False
 
 def eff_sum(raw: int, alignment: str) -> int:
     if alignment == "g": return int(raw * 1.1)
@@ -105,17 +196,20 @@ def eff_sum(raw: int, alignment: str) -> int:
 
 # ── Battle ────────────────────────────────────────────────────────────────────
 async def resolve_battle(db: Database, challenger, opponent,
-                         collision: bool = False) -> list:
+                         collision: bool = False, sums: Optional[dict] = None) -> list:
+    """sums: optional pre-fetched {player_id: item sum} covering both sides."""
     # Always re-fetch for current TTL
     c = await db.get_player_by_id(challenger["id"]) or challenger
     o = await db.get_player_by_id(opponent["id"])   or opponent
     if c["id"] == o["id"]:
         return []   # never battle yourself
 
-    c_sum  = eff_sum(await db.get_item_sum(c["id"]), c["alignment"])
-    o_sum  = eff_sum(await db.get_item_sum(o["id"]), o["alignment"])
-    c_roll = random.randint(0, max(c_sum - 1, 0))
-    o_roll = random.randint(0, max(o_sum - 1, 0))
+    if sums is None or c["id"] not in sums or o["id"] not in sums:
+        sums = await db.get_item_sums((c["id"], o["id"]))
+    c_sum  = eff_sum(sums.get(c["id"], 0), c["alignment"])
+    o_sum  = eff_sum(sums.get(o["id"], 0), o["alignment"])
+    c_roll = _randint(0, max(c_sum - 1, 0))
+    o_roll = _randint(0, max(o_sum - 1, 0))
     won    = c_roll >= o_roll
     winner, loser = (c, o) if won else (o, c)
     msgs   = []
@@ -135,14 +229,14 @@ async def resolve_battle(db: Database, challenger, opponent,
         msgs += [broadcast_all(msg),
                  broadcast_all(f"{utag(winner)} reaches next level in {fmt_time(new_ttl)}.")]
         cs = 50 if c["alignment"] == "g" else 20 if c["alignment"] == "e" else 35
-        if random.randint(0, cs - 1) < 1:
-            crit = int(((5 + random.randint(0, 19)) / 100) * loser["ttl"])
+        if _randint(0, cs - 1) < 1:
+            crit = int(((5 + _randint(0, 19)) / 100) * loser["ttl"])
             await db.add_penalty(loser["id"], crit)
             cm = (f"{utag(winner)} dealt {utag(loser)} a Critical Strike! "
                   f"{fmt_time(crit)} added to {utag(loser)}'s clock.")
             msgs.append(broadcast_all(cm))
             await db.log_event("critical", cm, winner["id"], loser["id"])
-        elif random.randint(0, 24) < 1 and winner["level"] > 19:
+        elif _randint(0, 24) < 1 and winner["level"] > 19:
             result = await db.steal_item(winner["id"], loser["id"])
             if result:
                 slot, sl, ol = result
@@ -162,6 +256,107 @@ async def resolve_battle(db: Database, challenger, opponent,
     return msgs
 
 
+def _reservoir_sample(items, k: int) -> list:
+    """k uniformly chosen items from an iterable in one pass (Algorithm R),
+    without materialising the whole filtered sequence. Returns fewer than k
+    items if the iterable is that short; order is shuffled like random.sample."""
+    picked = []
+    for i, item in enumerate(items):
+        if i < k:
+            picked.append(item)
+        else:
+            j = _randrange(i + 1)
+            if j < k:
+                picked[j] = item
+    random.shuffle(picked)
+    return picked
+
+
+# ── Quest & event text ────────────────────────────────────────────────────────
+_LANDMARKS = (
+    ("The Roaring Swell",   54,  72),
+    ("Deadman's Cove",     193,  70),
+    ("Serpent's Current",  307,  74),
+    ("Whaler's Notch",     446,  68),
+    ("Kraken Deep",         72, 180),
+    ("Smuggler's Run",     180, 196),
+    ("Mermaid's Lagoon",   320, 179),
+    ("Freeport",           428, 194),
+    ("Cutthroat Cove",      69, 302),
+    ("The Howling Gale",   179, 320),
+    ("Marauder's Bay",     321, 306),
+    ("The Devil's Passage",430, 321),
+    ("The Abyssal Plain",   70, 429),
+    ("The Frozen South",   181, 444),
+    ("Antarctica's Edge",  319, 428),
+    ("The Endless Deep",   428, 445),
+)
+_QUESTS = (
+    ("Q1", "sail through the Roaring Swell and survive the tempest unscathed"),
+    ("Q1", "retrieve the cursed treasure chest from Deadman's Cove before the tide turns"),
+    ("Q1", "escort the merchant fleet safely past Shipwreck Reef to Freeport"),
+    ("Q1", "break the sea witch's curse haunting the waters of Mermaid's Lagoon"),
+    ("Q1", "defend Port Royal from the incoming pirate armada until dawn"),
+    ("Q1", "recover the Pirate King's stolen crown from Blackbeard's Cove"),
+    ("Q1", "navigate the Serpent's Current and chart a safe passage for the fleet"),
+    ("Q1", "rescue the prisoners held captive at Gallows Reef before high tide"),
+    ("Q1", "destroy the kraken's eggs hidden in the depths of Kraken Deep"),
+    ("Q1", "barter passage through Cutthroat Cove without firing a single shot"),
+    ("Q2", "brave the open seas to reach the lost ruins"),
+    ("Q2", "chart the treacherous waters between two pirate strongholds"),
+    ("Q2", "deliver the sealed orders across enemy-controlled waters"),
+    ("Q2", "follow the ancient map to uncover the buried treasure"),
+)
+# {u} = utag(player), {t} = fmt_time(delta), {lvl} = next level
+_HOG_HELP = (
+    "The seas parted and a divine wind carried {u}'s vessel {t} toward level {lvl}.",
+    "Neptune himself rose from the deep and blessed {u}, carrying them {t} toward level {lvl}.",
+    "A legendary kraken cleared the path ahead for {u}, saving them {t} toward level {lvl}.",
+)
+_HOG_HURT = (
+    "The Hand of Davy Jones reached up and dragged {u} down, slowing them {t} from level {lvl}.",
+    "A furious storm conjured by the sea gods battered {u}'s ship, costing them {t} from level {lvl}.",
+    "The Kraken rose from Kraken Deep and smashed {u}'s hull, slowing them {t} from level {lvl}.",
+)
+_CALAMITY_ITEM = {   # keyed by item slot; same order as _GODSEND_ITEM
+    "amulet":   "{u}'s amulet was lost overboard in a storm",
+    "idol":     "{u}'s idol was stolen by a port pickpocket",
+    "cutlass":  "{u} left their cutlass to rust in the bilge",
+    "coat":     "{u}'s coat was shredded by the Kraken's tentacle",
+    "buckler":  "{u}'s buckler was crushed under a falling mast",
+    "breeches": "{u}'s breeches were eaten by ship rats",
+}
+_CALAMITY_TEXT = (
+    "{u} was press-ganged into swabbing the poop deck",
+    "{u} fell into the hold chasing a runaway barrel",
+    "{u} got tangled in the rigging during a squall",
+    "{u} was marooned briefly on a sandbar",
+    "{u} drank a jug of bad rum and saw sea monsters",
+    "{u} was chased across three ports by an angry harbourmaster",
+    "{u} lost their sea charts in a tavern brawl",
+    "{u} sailed into the Howling Gale without a compass",
+)
+_GODSEND_ITEM = {
+    "amulet":   "{u}'s amulet was blessed by a sea witch",
+    "idol":     "{u}'s idol glowed after surviving the Howling Gale",
+    "cutlass":  "{u} had their cutlass reforged by a Freeport blacksmith",
+    "coat":     "A mermaid wove enchanted silk into {u}'s coat",
+    "buckler":  "{u}'s buckler was reinforced with kraken bone",
+    "breeches": "{u}'s breeches were stitched with enchanted sailcloth",
+}
+_GODSEND_TEXT = (
+    "{u} discovered a chest of gold doubloons washed ashore",
+    "{u} caught a legendary wind and made record time",
+    "{u} was blessed by the ghost of a friendly buccaneer",
+    "{u} found a mermaid's pearl that grants swift passage",
+    "{u} rode a pod of dolphins through Mermaid's Lagoon",
+    "{u} deciphered an ancient sea chart leading to a shortcut",
+    "{u} was hailed as a hero at Port Royal and feasted royally",
+    "{u} survived the Kraken's gaze and emerged stronger",
+)
+_ITEM_EVENT_SLOTS = tuple(_CALAMITY_ITEM)
+
+
 # ── Game Engine ───────────────────────────────────────────────────────────────
 class GameEngine:
     def __init__(self, db: Database, self_clock: int = 5, limit_pen: int = 0,
@@ -185,7 +380,7 @@ class GameEngine:
         self._relogin_who    = False  # signal bots to re-WHO on admin RELOGIN command
         self.silent     = 0          # 0=all, 1=no chan, 2=no pm, 3=no both
         self._quest = {
-            "questers": [], "type": 1, "stage": 1,
+            "questers": [], "quester_ids": set(), "type": 1, "stage": 1,
             "p1": None, "p2": None,
             "qtime": int(time.time()) + random.randint(3600, 7200),
             "text": "",
@@ -195,15 +390,21 @@ class GameEngine:
         """Restore any in-progress quest from DB after restart."""
         q = await self.db.load_quest()
         if q["questers"]:
+            q["quester_ids"] = {x["id"] for x in q["questers"]}
             self._quest = q
             names = ", ".join(f"{x['username']}@{x['network']}" for x in q["questers"])
             log.info(f"Restored active quest: {q['text']!r} — questers: {names}")
 
+    def _set_questers(self, questers: list):
+        """Assign the quest party, keeping the id set used by _qpc in step."""
+        self._quest["questers"]    = questers
+        self._quest["quester_ids"] = {x["id"] for x in questers}
+
     async def check_win_condition(self) -> list:
         """Called on startup — if any player is already at win_level, trigger reset."""
         if self.hof_type != "level":
             return []
-        all_players = await self.db.get_all_players()
+        all_players = await self.db.get_all_players(fresh=True)
         winners = [p for p in all_players if p["level"] >= self.win_level]
         if winners and not self._reset_pending and not self._quest["questers"]:
             self._reset_pending = True
@@ -227,18 +428,15 @@ class GameEngine:
 
     async def on_login(self, username, network, nick, channel,
                        password, userhost="") -> tuple:
-        p = await self.db.get_player(username, network)
-        if not p:
-            # Try any network — usernames are globally unique
-            p = await self.db.get_player_any_network(username)
-            if not p:
-                return False, "No such account. Use REGISTER to create one."
-            # Allow login from any network
-        if p["password_hash"] != self.db.hash_password(password):
+        # Prefers this network, then any network — usernames are globally unique
+        status, p = await self.db.try_login(username, network, password,
+                                            nick, channel, userhost)
+        if status == "nouser":
+            return False, "No such account. Use REGISTER to create one."
+        if status == "badpass":
             return False, "Wrong password."
-        if p["is_online"]:
+        if status == "online":
             return False, "You are already logged in."
-        await self.db.set_online(p["id"], nick, channel, userhost)
         return True, (
             f"Logon successful. {username}, the level {p['level']} "
             f"{p['class']}. Next level in {fmt_time(p['ttl'])}."
@@ -254,16 +452,13 @@ class GameEngine:
         if len(char_class) > 30:
             return False, "Character classes must be < 31 chars.", []
 
-        # Global uniqueness — username must be unique across ALL networks
-        existing = await self.db.get_player_any_network(username)
-        if existing:
-            return False, f"Sorry, the name {username} is already taken.", []
-
-        pid = await self.db.register_player(username, network, password, char_class)
+        # Global uniqueness — the NOCASE unique index rejects a name taken on
+        # any network; the new player is logged in by the same INSERT.
+        pid = await self.db.register_player(username, network, password, char_class,
+                                            online=(nick, channel, userhost))
         if pid is None:
-            return False, "Sorry, that character name is already in use.", []
+            return False, f"Sorry, the name {username} is already taken.", []
 
-        await self.db.set_online(pid, nick, channel, userhost)
         priv = (
             f"Success! Account {username} created. You have "
             f"{fmt_time(RP_BASE)} until level 1. "
@@ -281,11 +476,10 @@ class GameEngine:
         p = await self.db.get_player_by_nick(nick, network)
         if not p or not p["is_online"]: return []
         pen = calc_penalty("logout", p["level"], limit_pen=self.limit_pen)
-        await self.db.add_penalty(p["id"], pen, "pen_logout")
-        await self.db.set_offline(p["id"])
+        await self.db.penalize_and_offline(p["id"], pen, "pen_logout")
         return [broadcast_notice(network, nick,
             f"Penalty of {fmt_time(pen)} added to your timer for LOGOUT."
-        )] + await self._qpc(p)
+        )] + (await self._qpc(p) if self._on_quest(p) else [])
 
     async def on_nick_change(self, old_nick, new_nick, network) -> list:
         p = await self.db.get_player_by_nick(old_nick, network)
@@ -295,35 +489,32 @@ class GameEngine:
         await self.db.update_nick(p["id"], new_nick)
         return [broadcast_notice(network, new_nick,
             f"Penalty of {fmt_time(pen)} added to your timer for nick change."
-        )] + await self._qpc(p)
+        )] + (await self._qpc(p) if self._on_quest(p) else [])
 
     async def on_part(self, nick, network) -> list:
         p = await self.db.get_player_by_nick(nick, network)
         if not p or not p["is_online"]: return []
         pen = calc_penalty("part", p["level"], limit_pen=self.limit_pen)
-        await self.db.add_penalty(p["id"], pen, "pen_part")
-        await self.db.set_offline(p["id"])
+        await self.db.penalize_and_offline(p["id"], pen, "pen_part")
         return [broadcast_net(network,
             f"{utag(p)} has parted. Penalty: {fmt_time(pen)}."
-        )] + await self._qpc(p)
+        )] + (await self._qpc(p) if self._on_quest(p) else [])
 
     async def on_quit(self, nick, network) -> list:
         p = await self.db.get_player_by_nick(nick, network)
         if not p or not p["is_online"]: return []
         pen = calc_penalty("quit", p["level"], limit_pen=self.limit_pen)
-        await self.db.add_penalty(p["id"], pen, "pen_quit")
-        await self.db.set_offline(p["id"])
-        return await self._qpc(p)
+        await self.db.penalize_and_offline(p["id"], pen, "pen_quit")
+        return await self._qpc(p) if self._on_quest(p) else []
 
     async def on_kick(self, nick, network) -> list:
         p = await self.db.get_player_by_nick(nick, network)
         if not p or not p["is_online"]: return []
         pen = calc_penalty("kick", p["level"], limit_pen=self.limit_pen)
-        await self.db.add_penalty(p["id"], pen, "pen_kick")
-        await self.db.set_offline(p["id"])
+        await self.db.penalize_and_offline(p["id"], pen, "pen_kick")
         return [broadcast_net(network,
             f"{utag(p)} was kicked! Penalty: {fmt_time(pen)}."
-        )] + await self._qpc(p)
+        )] + (await self._qpc(p) if self._on_quest(p) else [])
 
     async def on_message(self, nick, network, message) -> list:
         p = await self.db.get_player_by_nick(nick, network)
@@ -333,7 +524,7 @@ class GameEngine:
         await self.db.add_penalty(p["id"], pen, "pen_mesg")
         return [broadcast_notice(network, nick,
             f"Penalty of {fmt_time(pen)} added to your timer for talking."
-        )] + await self._qpc(p)
+        )] + (await self._qpc(p) if self._on_quest(p) else [])
 
     async def on_notice(self, nick, network, message) -> list:
         return await self.on_message(nick, network, message)
@@ -413,29 +604,11 @@ class GameEngine:
         if result:
             return result
         questers = random.sample(online, min(4, len(online)))
-        self._quest["questers"] = questers
+        self._set_questers(questers)
         names = ", ".join(f"{q['username']}@{q['network']}" for q in questers)
-        LANDMARKS = [
-            ("The Roaring Swell",   54,  72),
-            ("Deadman's Cove",     193,  70),
-            ("Serpent's Current",  307,  74),
-            ("Whaler's Notch",     446,  68),
-            ("Kraken Deep",         72, 180),
-            ("Smuggler's Run",     180, 196),
-            ("Mermaid's Lagoon",   320, 179),
-            ("Freeport",           428, 194),
-            ("Cutthroat Cove",      69, 302),
-            ("The Howling Gale",   179, 320),
-            ("Marauder's Bay",     321, 306),
-            ("The Devil's Passage",430, 321),
-            ("The Abyssal Plain",   70, 429),
-            ("The Frozen South",   181, 444),
-            ("Antarctica's Edge",  319, 428),
-            ("The Endless Deep",   428, 445),
-        ]
         avg_x     = sum(q["pos_x"] for q in questers) // len(questers)
         avg_y     = sum(q["pos_y"] for q in questers) // len(questers)
-        lm_sorted = sorted(LANDMARKS, key=lambda l: (l[1]-avg_x)**2+(l[2]-avg_y)**2)
+        lm_sorted = sorted(_LANDMARKS, key=lambda l: (l[1]-avg_x)**2+(l[2]-avg_y)**2)
         lm_pool   = lm_sorted[:max(4, len(lm_sorted)//2)]
         lm1, lm2  = random.sample(lm_pool, 2)
         self._quest["type"]   = 2
@@ -455,6 +628,7 @@ class GameEngine:
         msg = f"{msg1} {msg2}"
         await self.db.log_event("quest", msg)
         await self.db.save_quest(self._quest)
+        await self.db.commit()
         return [broadcast_all(msg1), broadcast_all(msg2)]
 
     async def cmd_newpass(self, nick, network, pw) -> str:
@@ -492,7 +666,9 @@ class GameEngine:
         return "Done.", [broadcast_all(msg)]
 
     async def cmd_hog(self, admin_nick, network) -> list:
-        return await self._hand_of_god(await self.db.get_online_players())
+        msgs = await self._hand_of_god(await self.db.get_online_players())
+        await self.db.commit()
+        return msgs
 
     async def cmd_delold(self, days: float) -> str:
         n = await self.db.delete_old_accounts(days)
@@ -536,14 +712,17 @@ class GameEngine:
 
     # ── Quest penalty check ───────────────────────────────────────────────────
 
+    def _on_quest(self, player) -> bool:
+        """Cheap sync check so the on_* handlers only await _qpc when it matters."""
+        return player["id"] in self._quest["quester_ids"]
+
     async def _qpc(self, player) -> list:
         q = self._quest
-        if not q["questers"]: return []
-        if not any(x["id"] == player["id"] for x in q["questers"]): return []
-        q["questers"] = []
+        self._set_questers([])
         q["qtime"]    = int(time.time()) + 43200
-        for p in await self.db.get_online_players():
-            await self.db.add_penalty(p["id"], int(15 * (RP_PEN_STEP ** p["level"])), "pen_quest")
+        await self.db.add_penalties(
+            [(p["id"], calc_penalty("quest", p["level"]))
+             for p in await self.db.get_online_players()], "pen_quest")
         await self.db.clear_quest()
         await self.db.commit()
         # Check if reset was deferred waiting for quest to end
@@ -556,19 +735,24 @@ class GameEngine:
     # ── Main tick ─────────────────────────────────────────────────────────────
 
     async def tick(self) -> list:
+        # One transaction per tick: every write below lands in a single commit
+        async with self.db.transaction():
+            return await self._tick()
+
+    async def _tick(self) -> list:
         if not self._lasttime:
             return []   # bot hasn't joined channel yet
         if self.paused:
             return []   # PAUSE mode active
+        now = int(time.time())   # one clock read for the whole tick
 
         # ── End-of-round reset ────────────────────────────────────────────────
-        if self._reset_pending and int(time.time()) >= self._reset_at:
+        if self._reset_pending and now >= self._reset_at:
             return await self._do_round_reset()
 
         # ── Cron-based round end ──────────────────────────────────────────────
         if self.hof_type == "cron" and not self._reset_pending:
             from croniter import croniter
-            now = int(time.time())
             
             # On first check, initialize to the last cron fire time to catch missed fires
             if self._last_cron_check == 0:
@@ -600,15 +784,15 @@ class GameEngine:
                 self._last_cron_check = last_fire
 
         msgs    = []
-        online  = await self.db.get_online_players()
+        ctx     = TickContext.from_rows(await self.db.get_online_players())
+        online  = ctx.online
         if not online:
             return []
 
         n       = len(online)
-        n_evil  = sum(1 for p in online if p["alignment"] == "e")
-        n_good  = sum(1 for p in online if p["alignment"] == "g")
-        cur     = int(time.time())
-        elapsed = cur - self._lasttime
+        n_evil  = len(ctx.evil)
+        n_good  = len(ctx.good)
+        elapsed = now - self._lasttime
         sc      = self.self_clock
 
         if elapsed <= 0:
@@ -618,40 +802,39 @@ class GameEngine:
 
         # ── TTL countdown ─────────────────────────────────────────────────────
         levelled_ids = set()
+        ttl_pairs    = []
         for p in online:
-            new_ttl = p["ttl"] - elapsed
+            new_ttl = p.ttl - elapsed
             if new_ttl < 1:
-                levelled_ids.add(p["id"])
-                await self.db.update_ttl(p["id"], 0)
-            else:
-                await self.db.update_ttl(p["id"], new_ttl)
-            # Accumulate total idle time
-            await self.db.conn.execute(
-                "UPDATE players SET idled=idled+? WHERE id=?", (elapsed, p["id"]))
+                levelled_ids.add(p.id)
+            ttl_pairs.append((p.id, new_ttl))
+            p.ttl = max(0, new_ttl)
 
-        # Commit TTL changes immediately so DB is never stale
-        await self.db.commit()
+        # One bulk write (TTL + total idle time) so level-ups below read current values
+        await self.db.update_ttl_bulk(ttl_pairs, idled=elapsed)
 
         # Process level-ups after committing TTL changes
         for pid in levelled_ids:
-            lu_msgs = await self._do_level_up(pid)
+            lu_msgs = await self._do_level_up(pid, ctx)
             log.info(f"Level-up for pid={pid} produced {len(lu_msgs)} broadcasts")
             msgs.extend(lu_msgs)
 
         # ── Daily random events ───────────────────────────────────────────────
+        # Each event fires on average once per K days per player: p = n*sc/(K*86400)
+        rate = sc / 86400
         try:
-            if random.random() < n      / ((20 * 86400) / sc): msgs.extend(await self._hand_of_god(online))
-            if random.random() < n      / ((24 * 86400) / sc): msgs.extend(await self._team_battle(online))
-            if random.random() < n      / ((8  * 86400) / sc): msgs.extend(await self._calamity(online))
-            if random.random() < n      / ((4  * 86400) / sc): msgs.extend(await self._godsend(online))
-            if random.random() < n_evil / ((8  * 86400) / sc): msgs.extend(await self._evilness(online))
-            if random.random() < n_good / ((12 * 86400) / sc): msgs.extend(await self._goodness(online))
+            if _rand() < n      * rate / 20: msgs.extend(await self._hand_of_god(online))
+            if _rand() < n      * rate / 24: msgs.extend(await self._team_battle(online))
+            if _rand() < n      * rate / 8:  msgs.extend(await self._calamity(online))
+            if _rand() < n      * rate / 4:  msgs.extend(await self._godsend(online))
+            if _rand() < n_evil * rate / 8:  msgs.extend(await self._evilness(online, ctx.evil, ctx.good))
+            if _rand() < n_good * rate / 12: msgs.extend(await self._goodness(online, ctx.good))
         except Exception as e:
             log.error(f"Daily event error: {e}", exc_info=True)
 
         # ── Movement ──────────────────────────────────────────────────────────
         try:
-            msgs.extend(await self._move_players(online))
+            msgs.extend(await self._move_players(ctx))
         except Exception as e:
             log.error(f"Movement error: {e}", exc_info=True)
 
@@ -662,26 +845,30 @@ class GameEngine:
 
         # ── Quest ─────────────────────────────────────────────────────────────
         try:
-            msgs.extend(await self._check_quest(online))
+            msgs.extend(await self._check_quest(online, now))
         except Exception as e:
             log.error(f"Quest error: {e}", exc_info=True)
 
         await self.db.commit()
-        self._lasttime = cur
+        self._lasttime = now
         if msgs:
             log.info(f"Tick returning {len(msgs)} broadcasts")
         return msgs
 
     # ── Level up ──────────────────────────────────────────────────────────────
 
-    async def _do_level_up(self, player_id: int) -> list:
-        """Re-fetches player from DB so TTL is always current."""
-        p = await self.db.get_player_by_id(player_id)
-        if not p:
-            return []
-        new_level = p["level"] + 1
+    async def _do_level_up(self, player_id: int, ctx: Optional[TickContext] = None) -> list:
+        """Uses the tick snapshot when given, else re-fetches the player."""
+        p = ctx.by_id.get(player_id) if ctx else None
+        if p is None:
+            row = await self.db.get_player_by_id(player_id)
+            if not row:
+                return []
+            p = Player.from_row(row)
+        new_level = p.level + 1
         new_ttl   = base_ttl(new_level)
-        await self.db.level_up(p["id"], new_level, new_ttl)
+        await self.db.level_up(p.id, new_level, new_ttl)
+        p.level, p.ttl, p.next_ttl = new_level, new_ttl, new_ttl
 
         # ── End of round check ────────────────────────────────────────────────
         if (self.hof_type == "level"
@@ -700,30 +887,33 @@ class GameEngine:
 
         # Issue #5: Level-up message format
         msgs = [broadcast_all(
-            f"{utag(p)}, the {p['class']}, has attained "
+            f"{utag(p)}, the {p.class_}, has attained "
             f"level {new_level}! Next level in {fmt_time(new_ttl)}."
         )]
-        log.info(f"Level up: {p['username']} -> level {new_level}")
+        log.info(f"Level up: {p.username} -> level {new_level}")
         await self.db.log_event("levelup",
-            f"{p['username']} reached level {new_level}", p["id"])
+            f"{p.username} reached level {new_level}", p.id)
 
         msgs.extend(await self._find_item(p, new_level))
 
-        # Battle on level-up
-        online    = await self.db.get_online_players()
-        opponents = [x for x in online if x["id"] != p["id"]]
-        if opponents and (new_level >= 25 or random.random() < 0.25):
-            fresh = await self.db.get_player_by_id(p["id"])
-            if fresh:
-                msgs.extend(await resolve_battle(
-                    self.db, fresh, random.choice(opponents)))
+        # Battle on level-up — p was updated in place above, so no re-fetch
+        online = ctx.online if ctx else await self.db.get_online_players()
+        n      = len(online)
+        has_opponent = n > 1 or (n == 1 and online[0]["id"] != p.id)
+        if has_opponent and (new_level >= 25 or _rand() < 0.25):
+            # Rejection-sample instead of copying online minus p: at most
+            # one of n entries is p, so this takes < 2 draws on average
+            opp = online[_randrange(n)]
+            while opp["id"] == p.id:
+                opp = online[_randrange(n)]
+            msgs.extend(await resolve_battle(self.db, p, opp))
         return msgs
 
     async def _find_item(self, player, level) -> list:
         slot, item_lvl, uname, is_unique = roll_item(level)
-        items   = {r["slot"]: dict(r) for r in await self.db.get_items(player["id"])}
-        cur_lvl = items.get(slot, {}).get("level", 0)
-        nick    = player.get("current_nick") or player["username"]
+        items   = await self.db.get_items_by_slot(player["id"])
+        cur_lvl = items.get(slot, 0)
+        nick    = player["current_nick"] or player["username"]
         net     = player["network"]
         if is_unique and item_lvl > cur_lvl:
             await self.db.set_item(player["id"], slot, item_lvl, uname, True)
@@ -743,66 +933,82 @@ class GameEngine:
 
     # ── Movement ──────────────────────────────────────────────────────────────
 
-    async def _move_players(self, online) -> list:
-        msgs = []
-        n    = len(online)
-        q    = self._quest
-        qids = {x["id"] for x in q["questers"]}
-
-        # Build state once OUTSIDE the loop — updates carry forward each step
-        player_state = {p["id"]: dict(p) for p in online}
+    async def _move_players(self, ctx: TickContext) -> list:
+        msgs   = []
+        online = ctx.online
+        n      = len(online)
+        q      = self._quest
+        qids   = q["quester_ids"]
+
+        # Positions live in parallel lists for the walk (index i <-> online[i])
+        # and are written back to the tick snapshot once movement is done
+        ids = [p.id for p in online]
+        xs  = [p.pos_x for p in online]
+        ys  = [p.pos_y for p in online]
+        on_grid_quest = q["type"] == 2 and bool(q["questers"])
         # Track which pairs have already battled this tick (across all movement steps)
         battled_pairs = set()
+        # Every random-walk step for the whole tick, drawn in one call
+        steps = iter(random.choices(_STEPS, k=2 * n * self.self_clock))
 
         for _ in range(self.self_clock):
             positions = {}
 
-            for p in online:
-                pid = p["id"]
-                x   = player_state[pid]["pos_x"]
-                y   = player_state[pid]["pos_y"]
+            for i in range(n):
+                pid = ids[i]
+                x   = xs[i]
+                y   = ys[i]
 
-                if pid in qids and q["type"] == 2 and random.random() < 0.33:
+                if on_grid_quest and pid in qids and _rand() < 0.33:
                     t  = q["p1"] if q["stage"] == 1 else q["p2"]
                     dx = 1 if x < t[0] else -1 if x > t[0] else 0
                     dy = 1 if y < t[1] else -1 if y > t[1] else 0
                 else:
-                    dx = random.randint(-1, 1)
-                    dy = random.randint(-1, 1)
+                    dx = next(steps)
+                    dy = next(steps)
 
-                nx = (x + dx) % MAP_X
-                ny = (y + dy) % MAP_Y
-                player_state[pid]["pos_x"] = nx
-                player_state[pid]["pos_y"] = ny
-                await self.db.update_position(pid, nx, ny)
+                nx = xs[i] = (x + dx) % MAP_X
+                ny = ys[i] = (y + dy) % MAP_Y
 
-                key = (nx, ny)
+                key = nx * MAP_Y + ny   # flat cell index — no tuple per step
                 if key in positions:
-                    other_pid = positions[key]
+                    j = positions[key]
+                    other_pid = ids[j]
                     pair = (min(pid, other_pid), max(pid, other_pid))
                     # No collision battles during grid quests — questers converge
                     # on the same cell intentionally, battles would be unfair
-                    is_quest_collision = (q["type"] == 2 and q["questers"]
+                    is_quest_collision = (on_grid_quest
                                           and (pid in qids or other_pid in qids))
                     if (other_pid != pid and n > 1 and pair not in battled_pairs
                             and not is_quest_collision
-                            and random.random() < 1 / n):
+                            and _rand() < 1 / n):
                         battled_pairs.add(pair)
+                        # The battle message reports where they met, not
+                        # where the tick started
+                        a, b = online[i], online[j]
+                        a.pos_x, a.pos_y = nx, ny
+                        b.pos_x, b.pos_y = xs[j], ys[j]
                         msgs.extend(await resolve_battle(
-                            self.db,
-                            player_state[pid],
-                            player_state[other_pid],
-                            collision=True))
+                            self.db, a, b, collision=True))
                 else:
-                    positions[key] = pid
+                    positions[key] = i
+
+            # One bulk write per sub-step
+            await self.db.update_positions_bulk(list(zip(ids, xs, ys)))
+
+        for p, x, y in zip(online, xs, ys):
+            p.pos_x = x
+            p.pos_y = y
+        player_state = ctx.by_id
 
         # Grid quest completion check
         if q["questers"] and q["type"] == 2:
-            fresh  = {p["id"]: p for p in await self.db.get_online_players()}
+            fresh  = player_state   # positions were written back above
             target = q["p1"] if q["stage"] == 1 else q["p2"]
             if all(
-                fresh.get(x["id"], {}).get("pos_x") == target[0] and
-                fresh.get(x["id"], {}).get("pos_y") == target[1]
+                x["id"] in fresh and
+                fresh[x["id"]].pos_x == target[0] and
+                fresh[x["id"]].pos_y == target[1]
                 for x in q["questers"]
             ):
                 if q["stage"] == 1:
@@ -814,11 +1020,9 @@ class GameEngine:
                     msg   = (f"{names} have completed their journey! "
                              "25% of their burden is eliminated.")
                     msgs.append(broadcast_all(msg))
-                    for x in q["questers"]:
-                        fp = fresh.get(x["id"])
-                        if fp:
-                            await self.db.update_ttl(x["id"], int(fp["ttl"] * 0.75))
-                    q["questers"] = []
+                    # Scaled in SQL: TTL may have moved in battles this tick
+                    await self.db.scale_ttl(q["quester_ids"], 0.75)
+                    self._set_questers([])
                     q["qtime"]    = int(time.time()) + 3600
                     await self.db.clear_quest()
                     await self.db.log_event("quest", msg)
@@ -827,20 +1031,18 @@ class GameEngine:
 
     # ── Quest ─────────────────────────────────────────────────────────────────
 
-    async def _check_quest(self, online) -> list:
-        q, now = self._quest, int(time.time())
+    async def _check_quest(self, online, now: Optional[int] = None) -> list:
+        q = self._quest
+        if now is None: now = int(time.time())
         if not q["questers"] and now > q["qtime"]:
-            return await self._start_quest(online)
+            return await self._start_quest(online, now)
         if q["questers"] and q["type"] == 1 and now > q["qtime"]:
             names = ", ".join(
                 f"{x['username']}@{x['network']}" for x in q["questers"])
             msg   = (f"{names} have blessed the realm by completing their quest! "
                      "25% of their burden is eliminated.")
-            for x in q["questers"]:
-                fp = await self.db.get_player_by_id(x["id"])
-                if fp:
-                    await self.db.update_ttl(x["id"], int(fp["ttl"] * 0.75))
-            q["questers"] = []
+            await self.db.scale_ttl(q["quester_ids"], 0.75)
+            self._set_questers([])
             q["qtime"]    = now + 21600
             await self.db.clear_quest()
             await self.db.log_event("quest", msg)
@@ -849,52 +1051,18 @@ class GameEngine:
             return msgs
         return []
 
-    async def _start_quest(self, online) -> list:
-        now      = int(time.time())
-        eligible = [p for p in online
-                    if p["level"] > 39
-                    and p["online_since"]
-                    and (now - p["online_since"]) >= 36000]
-        if len(eligible) < 4:
+    async def _start_quest(self, online, now: Optional[int] = None) -> list:
+        if now is None: now = int(time.time())
+        questers = _reservoir_sample(
+            (p for p in online
+             if p["level"] > 39
+             and p["online_since"]
+             and (now - p["online_since"]) >= 36000), 4)
+        if len(questers) < 4:
             return []
-        questers = random.sample(eligible, 4)
-        self._quest["questers"] = questers
+        self._set_questers(questers)
         names = ", ".join(f"{q['username']}@{q['network']}" for q in questers)
-        LANDMARKS = [
-            ("The Roaring Swell",   54,  72),
-            ("Deadman's Cove",     193,  70),
-            ("Serpent's Current",  307,  74),
-            ("Whaler's Notch",     446,  68),
-            ("Kraken Deep",         72, 180),
-            ("Smuggler's Run",     180, 196),
-            ("Mermaid's Lagoon",   320, 179),
-            ("Freeport",           428, 194),
-            ("Cutthroat Cove",      69, 302),
-            ("The Howling Gale",   179, 320),
-            ("Marauder's Bay",     321, 306),
-            ("The Devil's Passage",430, 321),
-            ("The Abyssal Plain",   70, 429),
-            ("The Frozen South",   181, 444),
-            ("Antarctica's Edge",  319, 428),
-            ("The Endless Deep",   428, 445),
-        ]
-        QUESTS = [
-            ("Q1", "sail through the Roaring Swell and survive the tempest unscathed"),
-            ("Q1", "retrieve the cursed treasure chest from Deadman's Cove before the tide turns"),
-            ("Q1", "escort the merchant fleet safely past Shipwreck Reef to Freeport"),
-            ("Q1", "break the sea witch's curse haunting the waters of Mermaid's Lagoon"),
-            ("Q1", "defend Port Royal from the incoming pirate armada until dawn"),
-            ("Q1", "recover the Pirate King's stolen crown from Blackbeard's Cove"),
-            ("Q1", "navigate the Serpent's Current and chart a safe passage for the fleet"),
-            ("Q1", "rescue the prisoners held captive at Gallows Reef before high tide"),
-            ("Q1", "destroy the kraken's eggs hidden in the depths of Kraken Deep"),
-            ("Q1", "barter passage through Cutthroat Cove without firing a single shot"),
-            ("Q2", "brave the open seas to reach the lost ruins"),
-            ("Q2", "chart the treacherous waters between two pirate strongholds"),
-            ("Q2", "deliver the sealed orders across enemy-controlled waters"),
-            ("Q2", "follow the ancient map to uncover the buried treasure"),
-        ]
-        qtype, text = random.choice(QUESTS)
+        qtype, text = random.choice(_QUESTS)
         self._quest["text"] = text
         if qtype == "Q1":
             self._quest["type"]  = 1
@@ -911,7 +1079,7 @@ class GameEngine:
             self._quest["stage"]  = 1
             avg_x = sum(q["pos_x"] for q in questers) // len(questers)
             avg_y = sum(q["pos_y"] for q in questers) // len(questers)
-            lm_sorted = sorted(LANDMARKS, key=lambda l: (l[1]-avg_x)**2+(l[2]-avg_y)**2)
+            lm_sorted = sorted(_LANDMARKS, key=lambda l: (l[1]-avg_x)**2+(l[2]-avg_y)**2)
             lm_pool   = lm_sorted[:max(4, len(lm_sorted)//2)]
             lm1, lm2  = random.sample(lm_pool, 2)
             self._quest["p1"]     = (lm1[1], lm1[2])
@@ -935,13 +1103,11 @@ class GameEngine:
     async def _do_round_reset(self) -> list:
         """Record top 3 in HoF, announce winners, reset all players for new round."""
         round_num   = await self.db.get_round()
-        all_players = await self.db.get_all_players()
+        all_players = await self.db.get_all_players(fresh=True)
 
         # Score each player: (level, item_sum)
-        scored = []
-        for p in all_players:
-            isum = await self.db.get_item_sum(p["id"])
-            scored.append((p, isum))
+        sums   = await self.db.get_item_sums()
+        scored = [(p, sums.get(p["id"], 0)) for p in all_players]
         scored.sort(key=lambda x: (x[0]["level"], x[1]), reverse=True)
 
         # Record top 3 in HoF
@@ -961,7 +1127,7 @@ class GameEngine:
             ranking = "no ranked players"
 
         # Clear quest
-        self._quest = {"questers": [], "type": 1, "stage": 1,
+        self._quest = {"questers": [], "quester_ids": set(), "type": 1, "stage": 1,
                        "p1": None, "p2": None, "qtime": 0, "text": "",
                        "p1name": "", "p2name": ""}
         await self.db.clear_quest()
@@ -987,7 +1153,7 @@ class GameEngine:
         online = await self.db.get_online_players()
         by_net: dict = {}
         for p in online:
-            by_net.setdefault(p["network"], []).append(p.get("current_nick") or p["username"])
+            by_net.setdefault(p["network"], []).append(p["current_nick"] or p["username"])
         for net in sorted(by_net):
             nicks = by_net[net]
             n     = len(nicks)
@@ -1015,7 +1181,7 @@ class GameEngine:
             return False, f"No character '{username}' exists."
         
         # If no userhost provided, preserve existing one or mark as needing WHO
-        if not userhost and p.get("userhost"):
+        if not userhost and p["userhost"]:
             userhost = p["userhost"]
         elif not userhost:
             # Will capture via WHO - return special signal
@@ -1035,155 +1201,113 @@ class GameEngine:
 
     async def _hand_of_god(self, online) -> list:
         if not online: return []
-        p       = random.choice(online)
-        helping = random.randint(0, 4) > 0
-        pct     = (5 + random.randint(0, 70)) / 100
+        p       = _choice(online)
+        u       = utag(p)
+        helping = _randint(0, 4) > 0
+        pct     = (5 + _randint(0, 70)) / 100
         t       = int(pct * p["ttl"])
         if helping:
-            await self.db.update_ttl(p["id"], max(0, p["ttl"] - t))
-            HOG_HELP = [
-                f"The seas parted and a divine wind carried {utag(p)}'s vessel {fmt_time(t)} toward level {p['level'] + 1}.",
-                f"Neptune himself rose from the deep and blessed {utag(p)}, carrying them {fmt_time(t)} toward level {p['level'] + 1}.",
-                f"A legendary kraken cleared the path ahead for {utag(p)}, saving them {fmt_time(t)} toward level {p['level'] + 1}.",
-            ]
-            msg = random.choice(HOG_HELP)
+            new_ttl = max(0, p["ttl"] - t)
+            await self.db.update_ttl(p["id"], new_ttl)
+            tmpl = _choice(_HOG_HELP)
         else:
-            await self.db.add_penalty(p["id"], t)
-            HOG_HURT = [
-                f"The Hand of Davy Jones reached up and dragged {utag(p)} down, slowing them {fmt_time(t)} from level {p['level'] + 1}.",
-                f"A furious storm conjured by the sea gods battered {utag(p)}'s ship, costing them {fmt_time(t)} from level {p['level'] + 1}.",
-                f"The Kraken rose from Kraken Deep and smashed {utag(p)}'s hull, slowing them {fmt_time(t)} from level {p['level'] + 1}.",
-            ]
-            msg = random.choice(HOG_HURT)
-        fp   = await self.db.get_player_by_id(p["id"])
+            new_ttl = await self.db.add_penalty(p["id"], t)
+            tmpl = _choice(_HOG_HURT)
+        msg  = tmpl.format(u=u, t=fmt_time(t), lvl=p["level"] + 1)
         msgs = [broadcast_all(msg)]
-        if fp:
+        if new_ttl is not None:
             msgs.append(broadcast_all(
-                f"{utag(p)} reaches next level in {fmt_time(fp['ttl'])}."))
+                f"{u} reaches next level in {fmt_time(new_ttl)}."))
         await self.db.log_event("hog", msg, p["id"])
         return msgs
 
     async def _calamity(self, online) -> list:
         if not online: return []
-        p  = random.choice(online)
-        IE = {
-            "amulet":   f"{utag(p)}'s amulet was lost overboard in a storm",
-            "idol":     f"{utag(p)}'s idol was stolen by a port pickpocket",
-            "cutlass":  f"{utag(p)} left their cutlass to rust in the bilge",
-            "coat":     f"{utag(p)}'s coat was shredded by the Kraken's tentacle",
-            "buckler":  f"{utag(p)}'s buckler was crushed under a falling mast",
-            "breeches": f"{utag(p)}'s breeches were eaten by ship rats",
-        }
-        if random.random() < 0.1:
-            slot = random.choice(list(IE.keys()))
+        p  = _choice(online)
+        u  = utag(p)
+        if _rand() < 0.1:
+            slot = _choice(_ITEM_EVENT_SLOTS)
             await self.db.modify_item_level(p["id"], slot, -0.10)
-            msg  = f"{IE[slot]}! {utag(p)}'s {slot} loses 10% effectiveness."
+            msg  = f"{_CALAMITY_ITEM[slot].format(u=u)}! {u}'s {slot} loses 10% effectiveness."
             await self.db.log_event("calamity", msg, p["id"])
             return [broadcast_all(msg)]
-        pct = (5 + random.randint(0, 7)) / 100
+        pct = (5 + _randint(0, 7)) / 100
         t   = int(pct * p["ttl"])
-        await self.db.add_penalty(p["id"], t)
-        TEXTS = [
-            f"{utag(p)} was press-ganged into swabbing the poop deck",
-            f"{utag(p)} fell into the hold chasing a runaway barrel",
-            f"{utag(p)} got tangled in the rigging during a squall",
-            f"{utag(p)} was marooned briefly on a sandbar",
-            f"{utag(p)} drank a jug of bad rum and saw sea monsters",
-            f"{utag(p)} was chased across three ports by an angry harbourmaster",
-            f"{utag(p)} lost their sea charts in a tavern brawl",
-            f"{utag(p)} sailed into the Howling Gale without a compass",
-        ]
-        fp   = await self.db.get_player_by_id(p["id"])
-        msg  = (f"{random.choice(TEXTS)}. This calamity slowed them "
+        new_ttl = await self.db.add_penalty(p["id"], t)
+        msg  = (f"{_choice(_CALAMITY_TEXT).format(u=u)}. This calamity slowed them "
                 f"{fmt_time(t)} from level {p['level'] + 1}.")
         msgs = [broadcast_all(msg)]
-        if fp:
+        if new_ttl is not None:
             msgs.append(broadcast_all(
-                f"{utag(p)} reaches next level in {fmt_time(fp['ttl'])}."))
+                f"{u} reaches next level in {fmt_time(new_ttl)}."))
         await self.db.log_event("calamity", msg, p["id"])
         return msgs
 
     async def _godsend(self, online) -> list:
         if not online: return []
-        p  = random.choice(online)
-        IE = {
-            "amulet":   f"{utag(p)}'s amulet was blessed by a sea witch",
-            "idol":     f"{utag(p)}'s idol glowed after surviving the Howling Gale",
-            "cutlass":  f"{utag(p)} had their cutlass reforged by a Freeport blacksmith",
-            "coat":     f"A mermaid wove enchanted silk into {utag(p)}'s coat",
-            "buckler":  f"{utag(p)}'s buckler was reinforced with kraken bone",
-            "breeches": f"{utag(p)}'s breeches were stitched with enchanted sailcloth",
-        }
-        if random.random() < 0.1:
-            slot = random.choice(list(IE.keys()))
+        p  = _choice(online)
+        u  = utag(p)
+        if _rand() < 0.1:
+            slot = _choice(_ITEM_EVENT_SLOTS)
             await self.db.modify_item_level(p["id"], slot, +0.10)
-            msg  = f"{IE[slot]}! {utag(p)}'s {slot} gains 10% effectiveness."
+            msg  = f"{_GODSEND_ITEM[slot].format(u=u)}! {u}'s {slot} gains 10% effectiveness."
             await self.db.log_event("godsend", msg, p["id"])
             return [broadcast_all(msg)]
-        pct = (5 + random.randint(0, 7)) / 100
+        pct = (5 + _randint(0, 7)) / 100
         t   = int(pct * p["ttl"])
-        await self.db.update_ttl(p["id"], max(0, p["ttl"] - t))
-        TEXTS = [
-            f"{utag(p)} discovered a chest of gold doubloons washed ashore",
-            f"{utag(p)} caught a legendary wind and made record time",
-            f"{utag(p)} was blessed by the ghost of a friendly buccaneer",
-            f"{utag(p)} found a mermaid's pearl that grants swift passage",
-            f"{utag(p)} rode a pod of dolphins through Mermaid's Lagoon",
-            f"{utag(p)} deciphered an ancient sea chart leading to a shortcut",
-            f"{utag(p)} was hailed as a hero at Port Royal and feasted royally",
-            f"{utag(p)} survived the Kraken's gaze and emerged stronger",
-        ]
-        fp   = await self.db.get_player_by_id(p["id"])
-        msg  = (f"{random.choice(TEXTS)}! This godsend accelerated them "
+        new_ttl = max(0, p["ttl"] - t)
+        await self.db.update_ttl(p["id"], new_ttl)
+        msg  = (f"{_choice(_GODSEND_TEXT).format(u=u)}! This godsend accelerated them "
                 f"{fmt_time(t)} towards level {p['level'] + 1}.")
-        msgs = [broadcast_all(msg)]
-        if fp:
-            msgs.append(broadcast_all(
-                f"{utag(p)} reaches next level in {fmt_time(fp['ttl'])}."))
         await self.db.log_event("godsend", msg, p["id"])
-        return msgs
+        return [broadcast_all(msg),
+                broadcast_all(f"{u} reaches next level in {fmt_time(new_ttl)}.")]
 
-    async def _goodness(self, online) -> list:
-        good = [p for p in online if p["alignment"] == "g"]
+    async def _goodness(self, online, good=None) -> list:
+        if good is None:
+            good = [p for p in online if p["alignment"] == "g"]
         if len(good) < 2: return []
         players = random.sample(good, 2)
-        gain    = 5 + random.randint(0, 7)
+        gain    = 5 + _randint(0, 7)
         msg     = (f"{utag(players[0])} and {utag(players[1])} sailed together "
                    f"under a blessed flag and the sea gods smiled upon them. "
                    f"{gain}% of their time is removed.")
-        msgs = [broadcast_all(msg)]
-        for p in players:
-            new_ttl = int(p["ttl"] * (1 - gain / 100))
-            await self.db.update_ttl(p["id"], new_ttl)
+        msgs  = [broadcast_all(msg)]
+        pairs = [(p["id"], int(p["ttl"] * (1 - gain / 100))) for p in players]
+        await self.db.update_ttl_bulk(pairs)
+        for p, (_pid, new_ttl) in zip(players, pairs):
             msgs.append(broadcast_all(
                 f"{utag(p)} reaches next level in {fmt_time(new_ttl)}."))
         await self.db.log_event("godsend", msg)
         return msgs
 
-    async def _evilness(self, online) -> list:
-        evil = [p for p in online if p["alignment"] == "e"]
+    async def _evilness(self, online, evil=None, good=None) -> list:
+        """evil/good: precomputed alignment partitions of online, if the caller has them."""
+        if evil is None:
+            evil = [p for p in online if p["alignment"] == "e"]
         if not evil: return []
-        me = random.choice(evil)
-        if random.random() < 0.5:
-            good = [p for p in online if p["alignment"] == "g"]
+        me = _choice(evil)
+        u  = utag(me)
+        if _rand() < 0.5:
+            if good is None:
+                good = [p for p in online if p["alignment"] == "g"]
             if not good: return []
-            target = random.choice(good)
+            target = _choice(good)
             result = await self.db.steal_item(me["id"], target["id"])
             if result:
                 slot, sl, ol = result
-                msg = (f"{utag(me)} stole {utag(target)}'s level "
+                msg = (f"{u} stole {utag(target)}'s level "
                        f"{sl} {slot}! Leaves their old level {ol} {slot} behind.")
                 await self.db.log_event("steal", msg, me["id"], target["id"])
                 return [broadcast_all(msg)]
             return []
-        t = int(me["ttl"] * (1 + random.randint(0, 4)) / 100)
-        await self.db.add_penalty(me["id"], t)
-        msg  = f"{utag(me)} is forsaken by their dark patron and cast adrift. {fmt_time(t)} added to their clock."
-        fp   = await self.db.get_player_by_id(me["id"])
+        t = int(me["ttl"] * (1 + _randint(0, 4)) / 100)
+        new_ttl = await self.db.add_penalty(me["id"], t)
+        msg  = f"{u} is forsaken by their dark patron and cast adrift. {fmt_time(t)} added to their clock."
         msgs = [broadcast_all(msg)]
-        if fp:
+        if new_ttl is not None:
             msgs.append(broadcast_all(
-                f"{utag(me)} reaches next level in {fmt_time(fp['ttl'])}."))
+                f"{u} reaches next level in {fmt_time(new_ttl)}."))
         await self.db.log_event("calamity", msg, me["id"])
         return msgs
 
@@ -1191,35 +1315,40 @@ class GameEngine:
         if len(online) < 6: return []
         sample = random.sample(online, 6)
         a, b   = sample[:3], sample[3:]
-        sa = sum(eff_sum(await self.db.get_item_sum(p["id"]), p["alignment"]) for p in a)
-        sb = sum(eff_sum(await self.db.get_item_sum(p["id"]), p["alignment"]) for p in b)
-        ra = random.randint(0, max(sa - 1, 0))
-        rb = random.randint(0, max(sb - 1, 0))
+        sums = await self.db.get_item_sums(p["id"] for p in sample)
+        sa = sum(eff_sum(sums.get(p["id"], 0), p["alignment"]) for p in a)
+        sb = sum(eff_sum(sums.get(p["id"], 0), p["alignment"]) for p in b)
+        ra = _randint(0, max(sa - 1, 0))
+        rb = _randint(0, max(sb - 1, 0))
         won  = ra >= rb
         gain = int(min(p["ttl"] for p in a) * 0.20)
-        msg  = (f"{', '.join(utag(p) for p in a)} [{ra}/{sa}] team battled "
-                f"{', '.join(utag(p) for p in b)} [{rb}/{sb}] and "
+        # List comprehensions: str.join builds a list from a generator anyway
+        tags_a = ", ".join([utag(p) for p in a])
+        tags_b = ", ".join([utag(p) for p in b])
+        msg  = (f"{tags_a} [{ra}/{sa}] team battled "
+                f"{tags_b} [{rb}/{sb}] and "
                 f"{'won' if won else 'lost'}! "
                 f"{fmt_time(gain)} {'removed from' if won else 'added to'} their clocks.")
-        for p in a:
-            if won: await self.db.update_ttl(p["id"], max(0, p["ttl"] - gain))
-            else:   await self.db.add_penalty(p["id"], gain)
+        if won: await self.db.update_ttl_bulk((p["id"], p["ttl"] - gain) for p in a)
+        else:   await self.db.add_penalties((p["id"], gain) for p in a)
         await self.db.log_event("team_battle", msg)
         return [broadcast_all(msg)]
 
     async def _high_level_battle(self, online) -> list:
         high = [p for p in online if p["level"] >= 45]
         if not high or len(high) / len(online) <= 0.15: return []
-        c      = random.choice(high)
-        others = [p for p in online if p["id"] != c["id"]]
-        if not others: return []
-        return await resolve_battle(self.db, c, random.choice(others))
+        if len(online) < 2: return []
+        c   = _choice(high)
+        opp = online[_randrange(len(online))]
+        while opp["id"] == c["id"]:     # redraw instead of copying online minus c
+            opp = online[_randrange(len(online))]
+        return await resolve_battle(self.db, c, opp)
 
     async def _announce_top(self) -> list:
-        players = await self.db.get_all_players()
+        players = await self.db.get_top_players(3)
         if not players: return []
         msgs = [broadcast_all("Idle RPG Top Players:")]
-        for i, p in enumerate(players[:3], 1):
+        for i, p in enumerate(players, 1):
             msgs.append(broadcast_all(
                 f"{utag(p)}, the level {p['level']} {p['class']}, "
                 f"is #{i}! Next level in {fmt_time(p['ttl'])}."))
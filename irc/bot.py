@@ -1,11 +1,94 @@
 """irc/bot.py — IRC adapter. All player commands via PM only."""
 import asyncio, logging
+from collections import OrderedDict
 from typing import Optional
-from engine.game_engine import GameEngine, Broadcast, broadcast_net
+from engine.game_engine import GameEngine, Broadcast, broadcast_net, fmt_time
+try:
+    import ssl as _ssl
+except ImportError:   # Python built without OpenSSL — plain-text networks only
+    _ssl = None
 
 log = logging.getLogger(__name__)
 
+_SSL_CONTEXTS: dict = {}   # tls_verify -> SSLContext, shared by every bot and reconnect
+
+def _ssl_context(verify: bool):
+    """Client SSL context, built (and the trust store loaded) once per mode."""
+    ctx = _SSL_CONTEXTS.get(verify)
+    if ctx is None:
+        if _ssl is None:
+            raise RuntimeError("use_ssl is set but this Python has no ssl module")
+        ctx = _ssl.create_default_context()
+        if not verify:
+            ctx.check_hostname = False
+            ctx.verify_mode = _ssl.CERT_NONE
+        _SSL_CONTEXTS[verify] = ctx
+    return ctx
+
+class _IRCProtocol(asyncio.BufferedProtocol):
+    """Reads into one reusable bytearray and frames lines on b"\n" there,
+    instead of StreamReader.readline() copying through its own buffer.
+    Complete lines (bytes) go to `lines`; None marks connection loss."""
+    BUF_SIZE = 8192   # IRC lines are capped at 512 bytes
+    MAX_LINE = 65536  # unterminated bytes tolerated before the link is dropped
+
+    def __init__(self):
+        self.lines     = asyncio.Queue()
+        self.transport = None
+        self._buf      = bytearray(self.BUF_SIZE)
+        self._view     = memoryview(self._buf)
+        self._wpos     = 0
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self._can_write.set()
+        self.lines.put_nowait(None)
+
+    def get_buffer(self, sizehint):
+        if self._wpos == len(self._buf):   # one unterminated line filled it
+            grown = bytearray(2 * len(self._buf))   # new array: views of the old may be live
+            grown[:self._wpos] = self._buf
+            self._buf, self._view = grown, memoryview(grown)
+        return self._view[self._wpos:]
+
+    def buffer_updated(self, nbytes):
+        buf, start = self._buf, 0
+        end = self._wpos + nbytes
+        nl  = buf.find(b"\n", self._wpos, end)
+        while nl != -1:
+            self.lines.put_nowait(bytes(self._view[start:nl + 1]))
+            start = nl + 1
+            nl    = buf.find(b"\n", start, end)
+        if start:   # keep the partial tail at the front (bytearray slice copies)
+            buf[:end - start] = buf[start:end]
+        self._wpos = end - start
+        if self._wpos > self.MAX_LINE:   # the StreamReader limit the old reader had
+            log.warning(f"Line exceeds {self.MAX_LINE} bytes without a newline; disconnecting")
+            self._wpos = 0
+            self.transport.close()
+
+    def eof_received(self):
+        return False   # let the transport close; connection_lost follows
+
+    def pause_writing(self):  self._can_write.clear()
+    def resume_writing(self): self._can_write.set()
+
+    async def drain(self):
+        await self._can_write.wait()
+
 class IRCBot:
+    SEND_QUEUE_MAX = 256    # lines; beyond this new output is dropped, not buffered
+    SEND_BURST     = 5      # token bucket: lines that may go out back-to-back
+    SEND_RATE      = 2.0    # ... refilled at this many lines/second (the old 0.5s pace)
+    SEND_BATCH     = 16     # most queued lines written with one transport write
+    ADMIN_TTL      = 30.0   # seconds an _is_admin answer is trusted
+    ADMIN_CACHE    = 256    # nicks kept in the admin cache (LRU)
+    PREFIX_CACHE   = 128    # encoded "PRIVMSG nick :" / "NOTICE nick :" prefixes kept
+
     def __init__(self, network_name, host, port, channel, nick, engine,
                  nickserv_pass=None, server_pass=None, use_ssl=False, tls_verify=True,
                  reconnect_delay=30, modes="+i"):
@@ -21,63 +104,86 @@ class IRCBot:
         self.tls_verify      = tls_verify
         self.reconnect_delay = reconnect_delay
         self.modes           = modes
-        self._reader         = None
-        self._writer         = None
+        self._proto: Optional[_IRCProtocol] = None
         self._connected      = False
-        self._send_queue     = asyncio.Queue()
+        self._send_queue     = asyncio.Queue(self.SEND_QUEUE_MAX)   # encoded lines, CRLF included
+        self._say_prefix     = f"PRIVMSG {channel} :".encode("utf-8")
+        self._nick_prefixes: OrderedDict[tuple[str, str], bytes] = OrderedDict()
         self.broadcast_callback = None   # set by BotManager
         self.manager            = None   # set by BotManager (for sibling lookup)
         self._prev_online: dict = {}     # userhost -> username for auto-login
+        self._prev_by_uah: dict = {}     # user@host -> [saved userhosts], same entries
         self._auto_logged_in: list = []  # nicks matched during WHO (for 315 summary)
+        self._who_logins: list = []      # (pid, nick, channel, userhost) flushed at 315
         self._pending_forcelogin = None  # (char, nick, channel, network) waiting for WHO
+        self._admin_cache: OrderedDict[str, tuple[bool, float]] = OrderedDict()  # nick -> (is_admin, expiry)
 
     async def run(self):
         while True:
             try:
                 await self._connect()
-                await asyncio.gather(self._recv_loop(), self._send_loop())
+                # A failure in either loop cancels the other one right away
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(self._recv_loop())
+                    tg.create_task(self._send_loop())
             except Exception as e:
                 log.error(f"[{self.network_name}] {e}", exc_info=True)
-            self._connected = False
+            finally:
+                self._connected = False
+                self._close_transport()
             log.info(f"[{self.network_name}] Reconnecting in {self.reconnect_delay}s...")
             await asyncio.sleep(self.reconnect_delay)
 
     async def _connect(self):
         log.info(f"[{self.network_name}] Connecting to {self.host}:{self.port}")
-        if self.use_ssl:
-            import ssl as _ssl
-            ctx = _ssl.create_default_context()
-            if not self.tls_verify:
-                ctx.check_hostname = False
-                ctx.verify_mode = _ssl.CERT_NONE
-            self._reader, self._writer = await asyncio.open_connection(
-                self.host, self.port, ssl=ctx)
-        else:
-            self._reader, self._writer = await asyncio.open_connection(
-                self.host, self.port)
+        ctx = _ssl_context(self.tls_verify) if self.use_ssl else None
+        _transport, self._proto = await asyncio.get_running_loop().create_connection(
+            _IRCProtocol, self.host, self.port, ssl=ctx)
         self._connected = True
         if self.server_pass: await self._raw(f"PASS {self.server_pass}")
         await self._raw(f"NICK {self.nick}")
         await self._raw(f"USER multirpg 0 * :Multi IdleRPG Bot")
 
+    def _close_transport(self):
+        if self._proto and self._proto.transport and not self._proto.transport.is_closing():
+            self._proto.transport.close()
+
     async def _recv_loop(self):
         while self._connected:
             try:
-                line = await self._reader.readline()
-                if not line: break
-                await self._handle_line(line.decode("utf-8", "replace").rstrip("\r\n"))
+                line = await self._proto.lines.get()
+                if line is None: break
+                await self._handle_line(line)
             except asyncio.CancelledError: break
             except Exception as e:
                 log.error(f"[{self.network_name}] recv: {e}"); break
+        self._connected = False   # stops _send_loop so run() reconnects
 
     async def _send_loop(self):
         log.info(f"[{self.network_name}] _send_loop started")
+        loop   = asyncio.get_running_loop()
+        tokens = float(self.SEND_BURST)
+        last   = loop.time()
         while self._connected:
             try:
                 line = await asyncio.wait_for(self._send_queue.get(), timeout=1.0)
-                log.info(f"[{self.network_name}] _send_loop sending: {line[:80]}")
-                await self._raw(line)
-                await asyncio.sleep(0.5)
+                now    = loop.time()
+                tokens = min(self.SEND_BURST, tokens + (now - last) * self.SEND_RATE)
+                last   = now
+                if tokens < 1:
+                    await asyncio.sleep((1 - tokens) / self.SEND_RATE)
+                    tokens, last = 1.0, loop.time()
+                # Take whatever else is already queued and affordable now, and
+                # send it with a single transport write + drain
+                batch  = [line]
+                while (len(batch) < self.SEND_BATCH and tokens >= len(batch) + 1
+                       and not self._send_queue.empty()):
+                    batch.append(self._send_queue.get_nowait())
+                tokens -= len(batch)
+                for l in batch:
+                    log.info(f"[{self.network_name}] _send_loop sending: "
+                             f"{l[:80].decode('utf-8', 'replace').rstrip()}")
+                await self._raw_many(batch)
             except asyncio.TimeoutError: continue
             except asyncio.CancelledError: break
         log.info(f"[{self.network_name}] _send_loop exited")
@@ -92,29 +198,62 @@ class IRCBot:
                 return bot
         return None
 
+    async def _raw_many(self, lines):
+        """Several pre-encoded, CRLF-terminated lines in one transport write and one drain."""
+        if self._proto and self._proto.transport and not self._proto.transport.is_closing():
+            self._proto.transport.write(b"".join(lines))
+            await self._proto.drain()
+
     async def _raw(self, line):
-        if self._writer:
-            self._writer.write((line + "\r\n").encode("utf-8"))
-            await self._writer.drain()
+        if self._proto and self._proto.transport and not self._proto.transport.is_closing():
+            self._proto.transport.write((line + "\r\n").encode("utf-8"))
+            await self._proto.drain()
 
     async def voice_user(self, nick):
         """Voice a user in the channel (+v). Silently ignored if bot has no ops."""
         await self._raw(f"MODE {self.channel} +v {nick}")
 
+    def _enqueue(self, prefix: bytes, msg: str):
+        """Queue msg as "<prefix><chunk>\r\n" lines, already encoded."""
+        for chunk in _split_bytes(msg.encode("utf-8", "replace")):
+            try:
+                self._send_queue.put_nowait(prefix + chunk + b"\r\n")
+            except asyncio.QueueFull:
+                log.warning(f"[{self.network_name}] send queue full — dropped: "
+                            f"{chunk[:80].decode('utf-8', 'replace')}")
+
+    def _drain_queue(self) -> int:
+        """Drop everything queued, in place — _send_loop may be blocked in
+        get() on this very queue, so it must not be swapped out."""
+        q, n = self._send_queue, 0
+        while True:
+            try: q.get_nowait()
+            except asyncio.QueueEmpty: return n
+            n += 1
+
+    def _prefix_for(self, command, nick) -> bytes:
+        """Encoded "COMMAND nick :" — the same few nicks get most PMs/notices."""
+        cache = self._nick_prefixes
+        key   = (command, nick)
+        prefix = cache.get(key)
+        if prefix is None:
+            prefix = cache[key] = f"{command} {nick} :".encode("utf-8")
+            if len(cache) > self.PREFIX_CACHE: cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return prefix
+
     async def say(self, msg):
         if self.engine.silent in (1, 3): return   # channel msgs suppressed
-        for chunk in _split(msg):
-            await self._send_queue.put(f"PRIVMSG {self.channel} :{chunk}")
+        self._enqueue(self._say_prefix, msg)
 
     async def notice_nick(self, nick, msg):
         if self.engine.silent in (2, 3): return   # private msgs suppressed
-        for chunk in _split(msg):
-            await self._send_queue.put(f"NOTICE {nick} :{chunk}")
+        self._enqueue(self._prefix_for("NOTICE", nick), msg)
 
     async def privmsg_nick(self, nick, msg):
         if self.engine.silent in (2, 3): return   # private msgs suppressed
-        for chunk in _split(msg):
-            await self._send_queue.put(f"PRIVMSG {nick} :{chunk}")
+        self._enqueue(self._prefix_for("PRIVMSG", nick), msg)
 
     async def deliver(self, b: Broadcast):
         """Called by BotManager to route cross-network broadcasts."""
@@ -124,229 +263,263 @@ class IRCBot:
         elif b.scope == "notice" and b.network == self.network_name and b.nick:
             await self.notice_nick(b.nick, b.message)
 
-    # ── IRC line parser ───────────────────────────────────────────────────────
+    async def deliver_many(self, broadcasts):
+        """deliver() for a whole batch; per-network order is unchanged."""
+        for b in broadcasts:
+            await self.deliver(b)
 
-    async def _handle_line(self, line):
-        parts = line.split()
-        if not parts: return
+    # ── IRC line parser ───────────────────────────────────────────────────────
 
-        # PING
-        if parts[0].upper() == "PING":
-            await self._raw(f"PONG {parts[1]}" if len(parts) > 1 else "PONG")
+    async def _handle_line(self, line: bytes):
+        # Connect bursts are mostly numerics nobody handles (002-005, 251-266,
+        # MOTD, NAMES); drop those on the raw command token, before decoding.
+        head = line.split(None, 2)
+        if not head: return
+        cmd = head[1] if head[0][:1] == b":" and len(head) > 1 else head[0]
+        # Servers send commands upper-case; only fall back to upper() on a miss
+        entry = self._LINE_HANDLERS.get(cmd) or self._LINE_HANDLERS.get(cmd.upper())
+        if entry is None: return
+        handler, user_line = entry
+
+        prefix, _command, params, trailing = _parse_irc(line)
+        if not user_line:
+            await handler(self, params, trailing)
             return
 
-        if len(parts) > 1:
-            cmd2 = parts[1]
-
-            # 001 — welcome / registered
-            if cmd2 == "001":
-                log.info(f"[{self.network_name}] Registered. Joining {self.channel}")
-                if self.nickserv_pass:
-                    await self._raw(f"PRIVMSG NickServ :IDENTIFY {self.nickserv_pass}")
-                    await asyncio.sleep(2)
-                if self.modes:
-                    await self._raw(f"MODE {self.current_nick} {self.modes}")
-                await self._raw(f"JOIN {self.channel}")
-                return
-
-            # 433 — nick in use
-            if cmd2 == "433":
-                self.current_nick += "_"
-                await self._raw(f"NICK {self.current_nick}")
-                return
-
-            # 352 — WHO reply: :server 352 botnick #chan user host server nick H :0 realname
-            if cmd2 == "352":
-                if len(parts) >= 8:
-                    who_nick = parts[7]
-                    who_user = parts[4]
-                    who_host = parts[5]
-                    uh       = f"{who_nick}!{who_user}@{who_host}"
-                    uah      = f"{who_user}@{who_host}"
-                    
-                    # Handle pending forcelogin first
-                    if self._pending_forcelogin and who_nick.lower() == self._pending_forcelogin[1].lower():
-                        char, nick, chan, net = self._pending_forcelogin
-                        p = await self.engine.db.get_player_any_network(char)
-                        if p:
-                            # Update userhost for the already-logged-in user
-                            await self.engine.db.conn.execute(
-                                "UPDATE players SET userhost=? WHERE id=?",
-                                (uh, p["id"]))
-                            await self.engine.db.conn.commit()
-                            await self.say(f"{char} was forcefully logged in from nick {who_nick}")
-                        self._pending_forcelogin = None
-                        return
-                    
-                    # Auto-login from _prev_online (reconnect tracking)
-                    if self._prev_online:
-                        for saved_uh, uname in list(self._prev_online.items()):
-                            saved_uah = saved_uh.split("!", 1)[1] if "!" in saved_uh else saved_uh
-                            if saved_uah == uah:
-                                p = await self.engine.db.get_player(uname, self.network_name)
-                                if p:
-                                    await self.engine.db.set_online(
-                                        p["id"], who_nick, self.channel, uh)
-                                    log.info(f"[{self.network_name}] Auto-login: {uname} ({uh})")
-                                    self._auto_logged_in.append(who_nick)
-                                del self._prev_online[saved_uh]
-                                break
-                    else:
-                        # Update userhost for already-logged-in users (e.g., after forcelogin)
-                        p = await self.engine.db.get_player_by_nick(who_nick, self.network_name)
-                        if p and p["is_online"]:
-                            await self.engine.db.set_online(p["id"], who_nick, self.channel, uh)
-                            log.info(f"[{self.network_name}] Updated userhost for {p['username']}: {uh}")
-                return
-
-            # 315 — end of WHO
-            if cmd2 == "315":
-                # Anyone still in _prev_online wasn't in the channel — log them out
-                for uname in self._prev_online.values():
-                    p = await self.engine.db.get_player(uname, self.network_name)
-                    if p:
-                        await self.engine.db.set_offline(p["id"])
-                        log.info(f"[{self.network_name}] {uname} not in channel — logged out")
-                self._prev_online = {}
-                # Announce summary then voice
-                logged_in = self._auto_logged_in[:]
-                self._auto_logged_in = []
-                if logged_in:
-                    n = len(logged_in)
-                    header = (
-                        f"{n} user{'s' if n != 1 else ''} automatically logged in "
-                        f"on {self.network_name}."
-                    )
-                    if n > 10:
-                        # Too many to list — just the count
-                        await self.say(header)
-                    else:
-                        # Split nick list across lines of ~400 chars each
-                        line_limit = 400
-                        nick_str   = ", ".join(logged_in)
-                        if len(header) + 1 + len(nick_str) <= line_limit:
-                            await self.say(f"{header} {nick_str}")
-                        else:
-                            await self.say(header)
-                            chunk, buf = [], ""
-                            for nick in logged_in:
-                                candidate = buf + (", " if buf else "") + nick
-                                if len(candidate) > line_limit:
-                                    await self.say(buf)
-                                    buf = nick
-                                else:
-                                    buf = candidate
-                            if buf:
-                                await self.say(buf)
-                online = await self.engine.db.get_online_players()
-                net_online = [p for p in online if p["network"] == self.network_name]
-                if net_online:
-                    # Delay for voicing — services need time to grant ops
-                    await asyncio.sleep(5)
-                    for p in net_online:
-                        if p.get("current_nick"):
-                            await self.voice_user(p["current_nick"])
-                return
-
         # Lines below need a proper :prefix
-        if not line.startswith(":"):
+        if not prefix:
+            return
+        usernick = prefix.split("!", 1)[0]
+        # Ignore our own messages for everything but JOIN
+        if usernick == self.current_nick and handler is not IRCBot._on_join:
+            return
+        await handler(self, prefix, usernick, params, trailing)
+
+    # ── Server lines ──────────────────────────────────────────────────────────
+
+    async def _on_ping(self, params, trailing):
+        if trailing is not None: await self._raw(f"PONG :{_to_str(trailing)}")
+        elif params:             await self._raw(f"PONG {params[0]}")
+        else:                    await self._raw("PONG")
+
+    async def _on_welcome(self, params, trailing):
+        """001 — registered."""
+        log.info(f"[{self.network_name}] Registered. Joining {self.channel}")
+        if self.nickserv_pass:
+            await self._raw(f"PRIVMSG NickServ :IDENTIFY {self.nickserv_pass}")
+            await asyncio.sleep(2)
+        if self.modes:
+            await self._raw(f"MODE {self.current_nick} {self.modes}")
+        await self._raw(f"JOIN {self.channel}")
+
+    async def _on_nick_in_use(self, params, trailing):
+        """433 — nick in use."""
+        self.current_nick += "_"
+        await self._raw(f"NICK {self.current_nick}")
+
+    async def _on_who_reply(self, params, trailing):
+        """352 — :server 352 botnick #chan user host server nick H :0 realname"""
+        if len(params) < 6:
+            return
+        who_user, who_host, who_nick = params[2], params[3], params[5]
+        uh       = f"{who_nick}!{who_user}@{who_host}"
+        uah      = f"{who_user}@{who_host}"
+
+        # Handle pending forcelogin first
+        if self._pending_forcelogin and who_nick.lower() == self._pending_forcelogin[1].lower():
+            char, nick, chan, net = self._pending_forcelogin
+            p = await self.engine.db.get_player_any_network(char)
+            if p:
+                # Update userhost for the already-logged-in user
+                await self.engine.db.set_userhost(p["id"], uh)
+                await self.say(f"{char} was forcefully logged in from nick {who_nick}")
+            self._pending_forcelogin = None
             return
 
-        prefix   = parts[0][1:]   # strip leading :
-        command  = parts[1].upper() if len(parts) > 1 else ""
-        usernick = prefix.split("!")[0] if "!" in prefix else prefix
-
-        # ── JOIN ─────────────────────────────────────────────────────────────
-        if command == "JOIN":
-            if usernick == self.current_nick:
-                log.info(f"[{self.network_name}] Joined {self.channel}.")
-                # Build prev_online map for WHO-based auto-login
-                prev = await self.engine.db.get_previously_online(self.network_name)
-                self._prev_online = {
-                    p["userhost"]: p["username"]
-                    for p in prev if p["userhost"]
-                }
-                self._auto_logged_in = []  # reset for this reconnect cycle
-                if self._prev_online:
-                    log.info(f"[{self.network_name}] {len(self._prev_online)} previously online — sending WHO")
-                    # Small delay: some servers (especially older ircds like DALnet) respond to
-                    # an immediate WHO with an empty 315 because the channel burst hasn't fully
-                    # synced yet.  Two seconds is enough for the memberlist to settle.
-                    await asyncio.sleep(2)
-                    await self._raw(f"WHO {self.channel}")
-                else:
-                    await self.engine.db.mark_all_offline(self.network_name)
-                # mark_joined AFTER setting up prev_online, so tick starts
-                self.engine.mark_joined()
-                return
-
-            # ── Auto-login by userhost when another user joins the channel ──
-            uh = prefix if "!" in prefix else ""
-            if uh and "!" in uh:
-                p = await self.engine.db.get_player_by_userhost(uh, self.network_name)
+        # Auto-login from _prev_online (reconnect tracking)
+        if self._prev_online:
+            saved = self._prev_by_uah.get(uah)
+            if saved:
+                saved_uh = saved.pop(0)
+                if not saved: del self._prev_by_uah[uah]
+                uname = self._prev_online.pop(saved_uh)
+                p = await self.engine.db.get_player(uname, self.network_name)
                 if p:
-                    await self.engine.db.set_online(
-                        p["id"], usernick, self.channel, uh)
-                    log.info(
-                        f"[{self.network_name}] Auto-login: {usernick} ({uh}) → {p['username']}")
-                    await self.say(
-                        f"{usernick} reconnected and was automatically logged in "
-                        f"as {p['username']}."
-                    )
-                    await self.voice_user(usernick)
-                    return
-            
-            # ── Update userhost for already-logged-in users (e.g., after forcelogin) ──
-            p = await self.engine.db.get_player_by_nick(usernick, self.network_name)
-            if p and p["is_online"] and uh and "!" in uh:
-                await self.engine.db.set_online(p["id"], usernick, self.channel, uh)
+                    self._who_logins.append((p["id"], who_nick, self.channel, uh))
+                    log.info(f"[{self.network_name}] Auto-login: {uname} ({uh})")
+                    self._auto_logged_in.append(who_nick)
+        else:
+            # Update userhost for already-logged-in users (e.g., after forcelogin)
+            p = await self.engine.db.get_player_by_nick(who_nick, self.network_name)
+            if p and p["is_online"]:
+                await self.engine.db.set_online(p["id"], who_nick, self.channel, uh)
                 log.info(f"[{self.network_name}] Updated userhost for {p['username']}: {uh}")
-            return
 
-        # Ignore our own messages for all other commands
+    async def _on_who_end(self, params, trailing):
+        """315 — end of WHO."""
+        if self._who_logins:
+            await self.engine.db.set_online_many(self._who_logins)
+            self._who_logins = []
+        # Anyone still in _prev_online wasn't in the channel — log them out
+        for uname in self._prev_online.values():
+            p = await self.engine.db.get_player(uname, self.network_name)
+            if p:
+                await self.engine.db.set_offline(p["id"])
+                log.info(f"[{self.network_name}] {uname} not in channel — logged out")
+        self.set_prev_online({})
+        # Announce summary then voice
+        logged_in = self._auto_logged_in[:]
+        self._auto_logged_in = []
+        if logged_in:
+            n = len(logged_in)
+            header = (
+                f"{n} user{'s' if n != 1 else ''} automatically logged in "
+                f"on {self.network_name}."
+            )
+            if n > 10:
+                # Too many to list — just the count
+                await self.say(header)
+            else:
+                # Split nick list across lines of ~400 chars each
+                line_limit = 400
+                nick_str   = ", ".join(logged_in)
+                if len(header) + 1 + len(nick_str) <= line_limit:
+                    await self.say(f"{header} {nick_str}")
+                else:
+                    await self.say(header)
+                    chunk, buf = [], ""
+                    for nick in logged_in:
+                        candidate = buf + (", " if buf else "") + nick
+                        if len(candidate) > line_limit:
+                            await self.say(buf)
+                            buf = nick
+                        else:
+                            buf = candidate
+                    if buf:
+                        await self.say(buf)
+        online = await self.engine.db.get_online_players()
+        net_online = [p for p in online if p["network"] == self.network_name]
+        if net_online:
+            # Delay for voicing — services need time to grant ops
+            await asyncio.sleep(5)
+            for p in net_online:
+                if p["current_nick"]:
+                    await self.voice_user(p["current_nick"])
+
+    def set_prev_online(self, prev: dict):
+        """Install the userhost -> username map the next WHO auto-logs in from,
+        indexed by user@host so each 352 reply is one dict lookup. Entries that
+        share a user@host keep their order and are matched first-come."""
+        self._prev_online = prev
+        by_uah: dict = {}
+        for saved_uh in prev:
+            by_uah.setdefault(saved_uh.split("!", 1)[-1], []).append(saved_uh)
+        self._prev_by_uah = by_uah
+
+    # ── User lines (:nick!user@host COMMAND ...) ──────────────────────────────
+
+    async def _on_join(self, prefix, usernick, params, trailing):
         if usernick == self.current_nick:
+            log.info(f"[{self.network_name}] Joined {self.channel}.")
+            # Build prev_online map for WHO-based auto-login
+            self.set_prev_online(
+                await self.engine.db.get_previously_online(self.network_name))
+            self._auto_logged_in = []  # reset for this reconnect cycle
+            self._who_logins     = []
+            if self._prev_online:
+                log.info(f"[{self.network_name}] {len(self._prev_online)} previously online — sending WHO")
+                # Small delay: some servers (especially older ircds like DALnet) respond to
+                # an immediate WHO with an empty 315 because the channel burst hasn't fully
+                # synced yet.  Two seconds is enough for the memberlist to settle.
+                await asyncio.sleep(2)
+                await self._raw(f"WHO {self.channel}")
+            else:
+                await self.engine.db.mark_all_offline(self.network_name)
+            # mark_joined AFTER setting up prev_online, so tick starts
+            self.engine.mark_joined()
             return
 
-        # ── PRIVMSG ───────────────────────────────────────────────────────────
-        if command == "PRIVMSG":
-            target = parts[2] if len(parts) > 2 else ""
-            text   = " ".join(parts[3:])[1:] if len(parts) > 3 else ""
-            uh     = prefix if "!" in prefix else usernick
-            if target.lower() == self.current_nick.lower():
-                # PM to bot → command handler
-                await self._handle_pm(usernick, text, userhost=uh)
-            elif target == self.channel:
-                # Channel message from player → penalty
-                await self._deliver_local(
-                    await self.engine.on_message(usernick, self.network_name, text))
-
-        elif command == "NOTICE":
-            target = parts[2] if len(parts) > 2 else ""
-            text   = " ".join(parts[3:])[1:] if len(parts) > 3 else ""
-            if target == self.channel:
-                await self._deliver_local(
-                    await self.engine.on_notice(usernick, self.network_name, text))
-
-        elif command == "PART":
-            await self._deliver_local(
-                await self.engine.on_part(usernick, self.network_name))
+        # ── Auto-login by userhost when another user joins the channel ──
+        uh = prefix if "!" in prefix else ""
+        if uh and "!" in uh:
+            p = await self.engine.db.get_player_by_userhost(uh, self.network_name)
+            if p:
+                await self.engine.db.set_online(
+                    p["id"], usernick, self.channel, uh)
+                log.info(
+                    f"[{self.network_name}] Auto-login: {usernick} ({uh}) → {p['username']}")
+                await self.say(
+                    f"{usernick} reconnected and was automatically logged in "
+                    f"as {p['username']}."
+                )
+                await self.voice_user(usernick)
+                return
 
-        elif command == "QUIT":
+        # ── Update userhost for already-logged-in users (e.g., after forcelogin) ──
+        p = await self.engine.db.get_player_by_nick(usernick, self.network_name)
+        if p and p["is_online"] and uh and "!" in uh:
+            await self.engine.db.set_online(p["id"], usernick, self.channel, uh)
+            log.info(f"[{self.network_name}] Updated userhost for {p['username']}: {uh}")
+
+    async def _on_privmsg(self, prefix, usernick, params, trailing):
+        target = params[0] if params else ""
+        text   = _to_str(trailing) if trailing is not None else " ".join(params[1:])
+        uh     = prefix if "!" in prefix else usernick
+        if target.lower() == self.current_nick.lower():
+            # PM to bot → command handler
+            await self._handle_pm(usernick, text, userhost=uh)
+        elif target == self.channel:
+            # Channel message from player → penalty
             await self._deliver_local(
-                await self.engine.on_quit(usernick, self.network_name))
+                await self.engine.on_message(usernick, self.network_name, text))
 
-        elif command == "NICK":
-            new_nick = parts[2].lstrip(":") if len(parts) > 2 else ""
-            if new_nick:
-                await self._deliver_local(
-                    await self.engine.on_nick_change(
-                        usernick, new_nick, self.network_name))
+    async def _on_notice(self, prefix, usernick, params, trailing):
+        target = params[0] if params else ""
+        text   = _to_str(trailing) if trailing is not None else " ".join(params[1:])
+        if target == self.channel:
+            await self._deliver_local(
+                await self.engine.on_notice(usernick, self.network_name, text))
+
+    async def _on_part(self, prefix, usernick, params, trailing):
+        self._admin_cache.pop(usernick, None)
+        await self._deliver_local(
+            await self.engine.on_part(usernick, self.network_name))
+
+    async def _on_quit(self, prefix, usernick, params, trailing):
+        self._admin_cache.pop(usernick, None)
+        await self._deliver_local(
+            await self.engine.on_quit(usernick, self.network_name))
+
+    async def _on_nick(self, prefix, usernick, params, trailing):
+        new_nick = params[0] if params else _to_str(trailing or b"")
+        self._admin_cache.pop(usernick, None)
+        self._admin_cache.pop(new_nick, None)
+        if new_nick:
+            await self._deliver_local(
+                await self.engine.on_nick_change(
+                    usernick, new_nick, self.network_name))
 
-        elif command == "KICK":
-            kicked = parts[3] if len(parts) > 3 else ""
-            if kicked:
-                await self._deliver_local(
-                    await self.engine.on_kick(kicked, self.network_name))
+    async def _on_kick(self, prefix, usernick, params, trailing):
+        kicked = params[1] if len(params) > 1 else ""
+        if kicked:
+            self._admin_cache.pop(kicked, None)
+            await self._deliver_local(
+                await self.engine.on_kick(kicked, self.network_name))
+
+    # Command -> handler, looked up once per line instead of an if/elif chain
+    _SERVER_HANDLERS = {
+        "PING": _on_ping, "001": _on_welcome, "433": _on_nick_in_use,
+        "352":  _on_who_reply, "315": _on_who_end,
+    }
+    _USER_HANDLERS = {
+        "JOIN": _on_join, "PRIVMSG": _on_privmsg, "NOTICE": _on_notice,
+        "PART": _on_part, "QUIT": _on_quit, "NICK": _on_nick, "KICK": _on_kick,
+    }
+    # Both tables keyed on the raw command token: (handler, is a user line)
+    _LINE_HANDLERS = {
+        **{c.encode(): (h, False) for c, h in _SERVER_HANDLERS.items()},
+        **{c.encode(): (h, True)  for c, h in _USER_HANDLERS.items()},
+    }
 
     # ── PM command dispatcher ─────────────────────────────────────────────────
 
@@ -357,249 +530,290 @@ class IRCBot:
 
         async def reply(msg): await self.privmsg_nick(nick, msg)
 
+        entry = self._PM_COMMANDS.get(cmd)
+        if entry is None:
+            await reply(f"Unknown command '{cmd}'. Send HELP for a list of commands.")
+            return
+        handler, admin_only = entry
         try:
-            await self._dispatch_pm(nick, cmd, args, reply, userhost)
+            if admin_only and not await self._is_admin(nick):
+                await reply("Access denied."); return
+            await handler(self, nick, args, reply, userhost)
+            if cmd in self._ADMIN_CACHE_RESETS: self._reset_admin_caches()
+            elif cmd in self._ADMIN_CACHE_DROPS: self._admin_cache.pop(nick, None)
         except Exception as e:
             log.error(f"[{self.network_name}] PM command error ({cmd}): {e}", exc_info=True)
             await reply(f"An error occurred processing your command.")
 
-    async def _dispatch_pm(self, nick, cmd, args, reply, userhost=""):
-
-        # ── Account ───────────────────────────────────────────────────────────
-
-        if cmd == "REGISTER":
-            if len(args) < 3:
-                await reply("Usage: REGISTER <username> <password> <class>")
-                await reply("Example: REGISTER PotHead toke420 420th Level Puffmage")
-                return
-            ok, priv, broadcasts = await self.engine.on_register(
-                args[0], self.network_name, nick, self.channel,
-                args[1], " ".join(args[2:]), userhost=userhost)
-            await reply(priv)
-            await self._deliver_local(broadcasts)
-            if ok:
-                await self.voice_user(nick)
-
-        elif cmd == "LOGIN":
-            if len(args) < 2:
-                await reply("Usage: LOGIN <username> <password>"); return
-            ok, msg = await self.engine.on_login(
-                args[0], self.network_name, nick, self.channel,
-                args[1], userhost=userhost)
-            await reply(msg)
-            if ok:
-                await self.voice_user(nick)
-
-        elif cmd == "LOGOUT":
-            broadcasts = await self.engine.on_logout(nick, self.network_name)
-            await self._deliver_local(broadcasts)
-            if not broadcasts: await reply("You are not logged in.")
-
-        elif cmd == "NEWPASS":
-            if not args: await reply("Usage: NEWPASS <password>"); return
-            await reply(await self.engine.cmd_newpass(nick, self.network_name, args[0]))
-
-        elif cmd == "ALIGN":
-            if not args: await reply("Usage: ALIGN <good|neutral|evil>"); return
-            msg, broadcasts = await self.engine.cmd_align(
-                nick, self.network_name, args[0].lower())
-            await reply(msg)
-            await self._deliver_local(broadcasts)
-
-        elif cmd == "REMOVEME":
-            msg, broadcasts = await self.engine.cmd_removeme(nick, self.network_name)
-            await reply(msg)
-            await self._deliver_local(broadcasts)
-
-        # ── Info ──────────────────────────────────────────────────────────────
+    # ── Account ───────────────────────────────────────────────────────────
 
-        elif cmd == "STATUS":
-            target = args[0] if args else None
-            await reply(await self.engine.cmd_status(nick, self.network_name, target))
-
-        elif cmd == "WHOAMI":
-            await reply(await self.engine.cmd_whoami(nick, self.network_name))
+    async def _cmd_register(self, nick, args, reply, userhost=""):
+        if len(args) < 3:
+            await reply("Usage: REGISTER <username> <password> <class>")
+            await reply("Example: REGISTER PotHead toke420 420th Level Puffmage")
+            return
+        ok, priv, broadcasts = await self.engine.on_register(
+            args[0], self.network_name, nick, self.channel,
+            args[1], " ".join(args[2:]), userhost=userhost)
+        await reply(priv)
+        await self._deliver_local(broadcasts)
+        if ok:
+            await self.voice_user(nick)
+
+    async def _cmd_login(self, nick, args, reply, userhost=""):
+        if len(args) < 2:
+            await reply("Usage: LOGIN <username> <password>"); return
+        ok, msg = await self.engine.on_login(
+            args[0], self.network_name, nick, self.channel,
+            args[1], userhost=userhost)
+        await reply(msg)
+        if ok:
+            await self.voice_user(nick)
+
+    async def _cmd_logout(self, nick, args, reply, userhost=""):
+        broadcasts = await self.engine.on_logout(nick, self.network_name)
+        await self._deliver_local(broadcasts)
+        if not broadcasts: await reply("You are not logged in.")
+
+    async def _cmd_newpass(self, nick, args, reply, userhost=""):
+        if not args: await reply("Usage: NEWPASS <password>"); return
+        await reply(await self.engine.cmd_newpass(nick, self.network_name, args[0]))
+
+    async def _cmd_align(self, nick, args, reply, userhost=""):
+        if not args: await reply("Usage: ALIGN <good|neutral|evil>"); return
+        msg, broadcasts = await self.engine.cmd_align(
+            nick, self.network_name, args[0].lower())
+        await reply(msg)
+        await self._deliver_local(broadcasts)
+
+    async def _cmd_removeme(self, nick, args, reply, userhost=""):
+        msg, broadcasts = await self.engine.cmd_removeme(nick, self.network_name)
+        await reply(msg)
+        await self._deliver_local(broadcasts)
+
+    # ── Info ──────────────────────────────────────────────────────────────
+
+    async def _cmd_status(self, nick, args, reply, userhost=""):
+        target = args[0] if args else None
+        await reply(await self.engine.cmd_status(nick, self.network_name, target))
+
+    async def _cmd_whoami(self, nick, args, reply, userhost=""):
+        await reply(await self.engine.cmd_whoami(nick, self.network_name))
+
+    async def _cmd_quest(self, nick, args, reply, userhost=""):
+        await reply(await self.engine.cmd_quest())
+
+    async def _cmd_forcequest(self, nick, args, reply, userhost=""):
+        bcast = await self.engine.cmd_forcequest()
+        if bcast:
+            await self._deliver_local(bcast)
+        else:
+            await reply("Could not start quest.")
+
+    async def _cmd_top(self, nick, args, reply, userhost=""):
+        players = await self.engine.db.get_top(5)
+        if not players: await reply("No players yet."); return
+        for i, p in enumerate(players, 1):
+            await reply(
+                f"{i}. {p['username']}@{p['network']} — "
+                f"Lv.{p['level']} {p['class']} | "
+                f"Items: {p['isum']} | TTL: {fmt_time(p['ttl'])}")
+
+    _HELP_LINES = (
+        "MultiRPG commands (all via PM to the bot):",
+        "  REGISTER <username> <password> <class>  — Create account",
+        "  LOGIN <username> <password>              — Log in",
+        "  LOGOUT                                   — Log out (penalty!)",
+        "  STATUS [username]                        — Show stats",
+        "  WHOAMI                                   — Short status",
+        "  QUEST                                    — Active quest info",
+        "  TOP                                      — Top 5 players",
+        "  NEWPASS <password>                       — Change password",
+        "  ALIGN <good|neutral|evil>                — Change alignment",
+        "  REMOVEME                                 — Delete account",
+        "Talking in channel, parting, quitting, nick changes = penalty!",
+        "Admin commands: HOG FORCEQUEST RELOGIN FORCELOGIN ENDROUND PUSH CHPASS CHCLASS CHUSER PAUSE SILENT CLEARQ DELOLD MKADMIN DELADMIN",
+    )
+
+    async def _cmd_help(self, nick, args, reply, userhost=""):
+        # One PRIVMSG per line — IRC messages cannot carry a newline; the
+        # send loop coalesces the burst into a single write anyway.
+        for line in self._HELP_LINES: await reply(line)
+
+    # ── Admin ─────────────────────────────────────────────────────────────
+
+    async def _cmd_hog(self, nick, args, reply, userhost=""):
+        await self._deliver_local(await self.engine.cmd_hog(nick, self.network_name))
+
+    async def _cmd_push(self, nick, args, reply, userhost=""):
+        if len(args) < 2 or not args[1].lstrip("-").isdigit():
+            await reply("Usage: PUSH <username> <seconds>"); return
+        msg, broadcasts = await self.engine.cmd_push(
+            nick, self.network_name, args[0], int(args[1]))
+        await reply(msg)
+        await self._deliver_local(broadcasts)
+
+    async def _cmd_chpass(self, nick, args, reply, userhost=""):
+        if len(args) < 2: await reply("Usage: CHPASS <username> <password>"); return
+        await reply(await self.engine.cmd_chpass(args[0], args[1]))
+
+    async def _cmd_chclass(self, nick, args, reply, userhost=""):
+        if len(args) < 2: await reply("Usage: CHCLASS <username> <class>"); return
+        await reply(await self.engine.cmd_chclass(args[0], " ".join(args[1:])))
+
+    async def _cmd_delold(self, nick, args, reply, userhost=""):
+        if not args or not args[0].replace(".", "").isdigit():
+            await reply("Usage: DELOLD <days>"); return
+        await reply(await self.engine.cmd_delold(float(args[0])))
+
+    async def _cmd_mkadmin(self, nick, args, reply, userhost=""):
+        if not args: await reply("Usage: MKADMIN <username>"); return
+        await self.engine.db.set_admin(args[0], True)
+        await reply(f"{args[0]} is now an admin.")
+
+    async def _cmd_deladmin(self, nick, args, reply, userhost=""):
+        if not args: await reply("Usage: DELADMIN <username>"); return
+        await self.engine.db.set_admin(args[0], False)
+        await reply(f"{args[0]} is no longer an admin.")
+
+    async def _cmd_chuser(self, nick, args, reply, userhost=""):
+        if len(args) < 2: await reply("Usage: CHUSER <username> <new name>"); return
+        await reply(await self.engine.cmd_chuser(args[0], args[1]))
+
+    async def _cmd_pause(self, nick, args, reply, userhost=""):
+        await reply(self.engine.cmd_pause())
+
+    async def _cmd_silent(self, nick, args, reply, userhost=""):
+        if not args or args[0] not in ("0","1","2","3"):
+            await reply("Usage: SILENT <0|1|2|3>  (0=all on, 1=no chan, 2=no pm, 3=all off)")
+            return
+        await reply(self.engine.cmd_silentmode(int(args[0])))
 
-        elif cmd == "QUEST":
-            await reply(await self.engine.cmd_quest())
+    async def _cmd_relogin(self, nick, args, reply, userhost=""):
+        await reply(self.engine.cmd_relogin())
 
-        elif cmd == "FORCEQUEST":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            bcast = await self.engine.cmd_forcequest()
-            if bcast:
-                await self._deliver_local(bcast)
-            else:
-                await reply("Could not start quest.")
-
-        elif cmd == "TOP":
-            players = await self.engine.db.get_all_players()
-            if not players: await reply("No players yet."); return
-            from engine.game_engine import fmt_time
-            for i, p in enumerate(players[:5], 1):
-                isum = await self.engine.db.get_item_sum(p["id"])
-                await reply(
-                    f"{i}. {p['username']}@{p['network']} — "
-                    f"Lv.{p['level']} {p['class']} | "
-                    f"Items: {isum} | TTL: {fmt_time(p['ttl'])}")
-
-        elif cmd == "HELP":
-            for line in [
-                "MultiRPG commands (all via PM to the bot):",
-                "  REGISTER <username> <password> <class>  — Create account",
-                "  LOGIN <username> <password>              — Log in",
-                "  LOGOUT                                   — Log out (penalty!)",
-                "  STATUS [username]                        — Show stats",
-                "  WHOAMI                                   — Short status",
-                "  QUEST                                    — Active quest info",
-                "  TOP                                      — Top 5 players",
-                "  NEWPASS <password>                       — Change password",
-                "  ALIGN <good|neutral|evil>                — Change alignment",
-                "  REMOVEME                                 — Delete account",
-                "Talking in channel, parting, quitting, nick changes = penalty!",
-                "Admin commands: HOG FORCEQUEST RELOGIN FORCELOGIN ENDROUND PUSH CHPASS CHCLASS CHUSER PAUSE SILENT CLEARQ DELOLD MKADMIN DELADMIN",
-            ]: await reply(line)
-
-        # ── Admin ─────────────────────────────────────────────────────────────
-
-        elif cmd == "HOG":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            await self._deliver_local(await self.engine.cmd_hog(nick, self.network_name))
-
-        elif cmd == "PUSH":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if len(args) < 2 or not args[1].lstrip("-").isdigit():
-                await reply("Usage: PUSH <username> <seconds>"); return
-            msg, broadcasts = await self.engine.cmd_push(
-                nick, self.network_name, args[0], int(args[1]))
-            await reply(msg)
+    async def _cmd_endround(self, nick, args, reply, userhost=""):
+        broadcasts = await self.engine.cmd_endround()
+        if broadcasts:
+            await reply("Round end scheduled — the realm resets in 60 seconds.")
             await self._deliver_local(broadcasts)
+        else:
+            await reply("A round reset is already in progress.")
 
-        elif cmd == "CHPASS":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if len(args) < 2: await reply("Usage: CHPASS <username> <password>"); return
-            await reply(await self.engine.cmd_chpass(args[0], args[1]))
-
-        elif cmd == "CHCLASS":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if len(args) < 2: await reply("Usage: CHCLASS <username> <class>"); return
-            await reply(await self.engine.cmd_chclass(args[0], " ".join(args[1:])))
-
-        elif cmd == "DELOLD":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if not args or not args[0].replace(".", "").isdigit():
-                await reply("Usage: DELOLD <days>"); return
-            await reply(await self.engine.cmd_delold(float(args[0])))
-
-        elif cmd == "MKADMIN":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if not args: await reply("Usage: MKADMIN <username>"); return
-            await self.engine.db.set_admin(args[0], True)
-            await reply(f"{args[0]} is now an admin.")
-
-        elif cmd == "DELADMIN":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if not args: await reply("Usage: DELADMIN <username>"); return
-            await self.engine.db.set_admin(args[0], False)
-            await reply(f"{args[0]} is no longer an admin.")
-
-        elif cmd == "CHUSER":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if len(args) < 2: await reply("Usage: CHUSER <username> <new name>"); return
-            await reply(await self.engine.cmd_chuser(args[0], args[1]))
-
-        elif cmd == "PAUSE":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            await reply(self.engine.cmd_pause())
-
-        elif cmd == "SILENT":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if not args or args[0] not in ("0","1","2","3"):
-                await reply("Usage: SILENT <0|1|2|3>  (0=all on, 1=no chan, 2=no pm, 3=all off)")
-                return
-            await reply(self.engine.cmd_silentmode(int(args[0])))
-
-        elif cmd == "RELOGIN":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            await reply(self.engine.cmd_relogin())
+    async def _cmd_forcelogin(self, nick, args, reply, userhost=""):
+        if len(args) < 3:
+            await reply("Usage: FORCELOGIN <character> <nick> <network> [userhost]")
+            await reply("Example: FORCELOGIN Manderz Amanda SwiftIRC")
+            await reply("With userhost: FORCELOGIN Manderz Amanda SwiftIRC Amanda!user@host.com")
+            return
 
-        elif cmd == "ENDROUND":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            broadcasts = await self.engine.cmd_endround()
-            if broadcasts:
-                await reply("Round end scheduled — the realm resets in 60 seconds.")
-                await self._deliver_local(broadcasts)
-            else:
-                await reply("A round reset is already in progress.")
-
-        elif cmd == "FORCELOGIN":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            if len(args) < 3:
-                await reply("Usage: FORCELOGIN <character> <nick> <network> [userhost]")
-                await reply("Example: FORCELOGIN Manderz Amanda SwiftIRC")
-                await reply("With userhost: FORCELOGIN Manderz Amanda SwiftIRC Amanda!user@host.com")
-                return
-            
-            char_nick = args[0]
-            irc_nick = args[1]
-            net_name = args[2]
-            userhost = args[3] if len(args) > 3 else ""
-            
-            # If no userhost provided, try to find it by checking if nick is in a player record
-            if not userhost:
-                existing_player = await self.engine.db.get_player_by_nick(irc_nick, net_name)
-                if existing_player and existing_player["userhost"]:
-                    userhost = existing_player["userhost"]
-            
-            ok, result = await self.engine.cmd_forcelogin(char_nick, irc_nick, net_name, self.channel, userhost)
-            if ok:
-                if isinstance(result, tuple) and result[0] == "needs_who":
-                    # Need to capture userhost via WHO. The WHO must be sent by the
-                    # bot connected to the *target* network — it's the only one that
-                    # will receive the 352 reply — not necessarily this bot.
-                    _, target_nick, char, chan, net = result
-                    target_bot = self.find_bot(net)
-                    # Use the target network's channel, not the admin's channel.
-                    who_chan = target_bot.channel if target_bot else chan
-                    # Set online immediately, then try to capture userhost via WHO
-                    p = await self.engine.db.get_player_any_network(char)
-                    if p:
-                        await self.engine.db.set_online(p["id"], target_nick, who_chan, userhost="")
-                        bcast = broadcast_net(net, f"{char} has been forcefully logged in from {target_nick} on {net}.")
-                        await self._deliver_local([bcast])
-                    await reply(f"{char} will be forcefully logged in as {target_nick}. Searching for userhost...")
-                    # Send WHO on the target network's bot to capture the userhost.
-                    if target_bot and target_bot._connected:
-                        target_bot._pending_forcelogin = (char, target_nick, who_chan, net)
-                        await target_bot._raw(f"WHO {target_nick}")
-                    else:
-                        await reply(f"Note: {target_nick}'s userhost could not be captured "
-                                    f"(bot not connected to {net}).")
+        char_nick = args[0]
+        irc_nick = args[1]
+        net_name = args[2]
+        userhost = args[3] if len(args) > 3 else ""
+
+        # If no userhost provided, try to find it by checking if nick is in a player record
+        if not userhost:
+            existing_player = await self.engine.db.get_player_by_nick(irc_nick, net_name)
+            if existing_player and existing_player["userhost"]:
+                userhost = existing_player["userhost"]
+
+        ok, result = await self.engine.cmd_forcelogin(char_nick, irc_nick, net_name, self.channel, userhost)
+        if ok:
+            if isinstance(result, tuple) and result[0] == "needs_who":
+                # Need to capture userhost via WHO. The WHO must be sent by the
+                # bot connected to the *target* network — it's the only one that
+                # will receive the 352 reply — not necessarily this bot.
+                _, target_nick, char, chan, net = result
+                target_bot = self.find_bot(net)
+                # Use the target network's channel, not the admin's channel.
+                who_chan = target_bot.channel if target_bot else chan
+                # Set online immediately, then try to capture userhost via WHO
+                p = await self.engine.db.get_player_any_network(char)
+                if p:
+                    await self.engine.db.set_online(p["id"], target_nick, who_chan, userhost="")
+                    bcast = broadcast_net(net, f"{char} has been forcefully logged in from {target_nick} on {net}.")
+                    await self._deliver_local([bcast])
+                await reply(f"{char} will be forcefully logged in as {target_nick}. Searching for userhost...")
+                # Send WHO on the target network's bot to capture the userhost.
+                if target_bot and target_bot._connected:
+                    target_bot._pending_forcelogin = (char, target_nick, who_chan, net)
+                    await target_bot._raw(f"WHO {target_nick}")
                 else:
-                    msg, broadcasts = result
-                    await reply(msg)
-                    await self._deliver_local(broadcasts)
-                    # Refresh/capture the userhost via WHO on whichever bot is connected
-                    # to the target network — not just when it happens to be this one.
-                    target_bot = self.find_bot(net_name)
-                    if target_bot and target_bot._connected:
-                        target_bot._pending_forcelogin = (char_nick, irc_nick, target_bot.channel, net_name)
-                        await asyncio.sleep(0.5)
-                        await target_bot._raw(f"WHO {irc_nick}")
+                    await reply(f"Note: {target_nick}'s userhost could not be captured "
+                                f"(bot not connected to {net}).")
             else:
-                await reply(result)
-
-        elif cmd == "CLEARQ":
-            if not await self._is_admin(nick): await reply("Access denied."); return
-            count = self._send_queue.qsize()
-            self._send_queue = __import__('asyncio').Queue()
-            await reply(f"Send queue cleared ({count} messages dropped).")
-
+                msg, broadcasts = result
+                await reply(msg)
+                await self._deliver_local(broadcasts)
+                # Refresh/capture the userhost via WHO on whichever bot is connected
+                # to the target network — not just when it happens to be this one.
+                target_bot = self.find_bot(net_name)
+                if target_bot and target_bot._connected:
+                    target_bot._pending_forcelogin = (char_nick, irc_nick, target_bot.channel, net_name)
+                    await asyncio.sleep(0.5)
+                    await target_bot._raw(f"WHO {irc_nick}")
         else:
-            await reply(f"Unknown command '{cmd}'. Send HELP for a list of commands.")
+            await reply(result)
+
+    async def _cmd_clearq(self, nick, args, reply, userhost=""):
+        count = self._drain_queue()
+        await reply(f"Send queue cleared ({count} messages dropped).")
+
+    # Command -> (handler, admin_only), resolved once per PM
+    _PM_COMMANDS = {
+        "REGISTER": (_cmd_register, False),
+        "LOGIN": (_cmd_login, False),
+        "LOGOUT": (_cmd_logout, False),
+        "NEWPASS": (_cmd_newpass, False),
+        "ALIGN": (_cmd_align, False),
+        "REMOVEME": (_cmd_removeme, False),
+        "STATUS": (_cmd_status, False),
+        "WHOAMI": (_cmd_whoami, False),
+        "QUEST": (_cmd_quest, False),
+        "FORCEQUEST": (_cmd_forcequest, True),
+        "TOP": (_cmd_top, False),
+        "HELP": (_cmd_help, False),
+        "HOG": (_cmd_hog, True),
+        "PUSH": (_cmd_push, True),
+        "CHPASS": (_cmd_chpass, True),
+        "CHCLASS": (_cmd_chclass, True),
+        "DELOLD": (_cmd_delold, True),
+        "MKADMIN": (_cmd_mkadmin, True),
+        "DELADMIN": (_cmd_deladmin, True),
+        "CHUSER": (_cmd_chuser, True),
+        "PAUSE": (_cmd_pause, True),
+        "SILENT": (_cmd_silent, True),
+        "RELOGIN": (_cmd_relogin, True),
+        "ENDROUND": (_cmd_endround, True),
+        "FORCELOGIN": (_cmd_forcelogin, True),
+        "CLEARQ": (_cmd_clearq, True),
+    }
+    # Commands that can change who holds an admin nick: everyone's cached
+    # answer is dropped on every network, or just the sender's here for their
+    # own session changes (nicks are per-network, so other bots are unaffected).
+    _ADMIN_CACHE_RESETS = frozenset(("MKADMIN", "DELADMIN", "CHUSER", "FORCELOGIN",
+                                     "ENDROUND", "RELOGIN"))
+    _ADMIN_CACHE_DROPS  = frozenset(("REGISTER", "LOGIN", "LOGOUT", "REMOVEME"))
+
+    def _reset_admin_caches(self):
+        """Drop every cached admin answer on all sibling bots, not just this one."""
+        for bot in (self.manager.bots if self.manager else (self,)):
+            bot._admin_cache.clear()
 
     async def _is_admin(self, nick):
+        now   = asyncio.get_running_loop().time()
+        cache = self._admin_cache
+        entry = cache.get(nick)
+        if entry and entry[1] > now:
+            cache.move_to_end(nick)
+            return entry[0]
         p = await self.engine.db.get_player_by_nick(nick, self.network_name)
-        return bool(p and p["is_admin"])
+        is_admin = bool(p and p["is_admin"])
+        cache[nick] = (is_admin, now + self.ADMIN_TTL)
+        cache.move_to_end(nick)
+        if len(cache) > self.ADMIN_CACHE: cache.popitem(last=False)
+        return is_admin
 
     async def _deliver_local(self, broadcasts: list):
         """
@@ -608,26 +822,61 @@ class IRCBot:
         broadcast_notice → NOTICE to specific nick on this network
         """
         if not broadcasts: return
-        all_bc   = [b for b in broadcasts if b.scope == "all"]
-        local_bc = [b for b in broadcasts if b.scope != "all"]
+        # One pass: global lines are collected, and only lines this network
+        # will actually send are kept for the local pass.
+        all_bc, local_bc, net = [], [], self.network_name
+        for b in broadcasts:
+            if b.scope == "all": all_bc.append(b)
+            elif b.network == net and (b.scope == "network" or (b.scope == "notice" and b.nick)):
+                local_bc.append(b)
+        # Global lines still go out before local ones, as they always have
         if all_bc:
             if self.broadcast_callback:
                 await self.broadcast_callback(all_bc)
             else:
                 for b in all_bc: await self.say(b.message)
         for b in local_bc:
-            if b.scope == "network" and b.network == self.network_name:
-                await self.say(b.message)
-            elif b.scope == "notice" and b.network == self.network_name and b.nick:
-                await self.notice_nick(b.nick, b.message)
-
-
-def _split(msg, max_len=400):
-    chunks = []
-    while len(msg) > max_len:
-        cut = msg.rfind(" ", 0, max_len)
-        if cut == -1: cut = max_len
-        chunks.append(msg[:cut])
-        msg = msg[cut:].lstrip()
-    if msg: chunks.append(msg)
-    return chunks
+            if b.scope == "network": await self.say(b.message)
+            else:                    await self.notice_nick(b.nick, b.message)
+
+
+def _parse_irc(line: bytes):
+    """Split one raw IRC line into (prefix, command, params, trailing) in a
+    single pass: str.find over the bytes, one decode per field. trailing is
+    the raw bytes after " :" (None if absent) — most handled commands never
+    read it, so handlers that do decode it with _to_str; command is upper-cased."""
+    end = len(line)
+    while end and line[end - 1] in b"\r\n": end -= 1
+    pos, prefix = 0, ""
+    if line[:1] == b":":
+        sp = line.find(b" ", 0, end)
+        if sp == -1: return line[1:end].decode("utf-8", "replace"), "", [], None
+        prefix, pos = line[1:sp].decode("utf-8", "replace"), sp + 1
+    while pos < end and line[pos] == 32: pos += 1   # tolerate doubled spaces
+    trailing = None
+    if line[pos:pos + 1] == b":":                   # no command, only trailing
+        return prefix, "", [], line[pos + 1:end]
+    cut = line.find(b" :", pos, end)
+    if cut != -1:
+        trailing = line[cut + 2:end]
+        end = cut
+    fields = line[pos:end].decode("utf-8", "replace").split()
+    if not fields: return prefix, "", [], trailing
+    return prefix, fields[0].upper(), fields[1:], trailing
+
+def _to_str(raw: bytes) -> str:
+    return raw.decode("utf-8", "replace")
+
+def _split_bytes(buf: bytes, max_len=400):
+    """Chunks of at most max_len bytes, cut at the last space (else on a UTF-8
+    character boundary). One index walk over buf; no re-slicing of the rest."""
+    n, pos = len(buf), 0
+    while n - pos > max_len:
+        cut = buf.rfind(b" ", pos, pos + max_len)
+        if cut <= pos:
+            cut = pos + max_len
+            while cut > pos + 1 and buf[cut] & 0xC0 == 0x80: cut -= 1   # continuation byte
+        yield buf[pos:cut]
+        pos = cut
+        while pos < n and buf[pos] == 32: pos += 1
+    if pos < n: yield buf[pos:]
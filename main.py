@@ -66,9 +66,13 @@ class BotManager:
         bot.broadcast_callback = self.deliver_all   # cross-network routing
         bot.manager = self                          # sibling lookup (forcelogin WHO)
     async def deliver_all(self, broadcasts: list[Broadcast]):
-        for b in broadcasts:
-            for bot in self.bots:
-                await bot.deliver(b)
+        # One coroutine per bot keeps each send queue's order; a failing
+        # network is logged and doesn't stop delivery to the others.
+        results = await asyncio.gather(
+            *(bot.deliver_many(broadcasts) for bot in self.bots), return_exceptions=True)
+        for bot, r in zip(self.bots, results):
+            if isinstance(r, BaseException):
+                log.error(f"[{bot.network_name}] deliver failed: {r!r}")
 
 async def game_tick_loop(engine, manager, self_clock):
     log.info(f"Tick loop started (self_clock={self_clock}s)")
@@ -81,13 +85,13 @@ async def game_tick_loop(engine, manager, self_clock):
                 engine._post_reset_who = False
                 engine._relogin_who    = False
                 await asyncio.sleep(2)
-                all_players = await engine.db.get_all_players()
+                all_players = await engine.db.get_all_players(fresh=True)
                 for bot in manager.bots:
                     # Filter to this bot's network only — cross-network userhosts
                     # must not bleed into another network's _prev_online map.
                     net_players = [p for p in all_players
-                                   if p["userhost"] and p.get("network") == bot.network_name]
-                    bot._prev_online = {p["userhost"]: p["username"] for p in net_players}
+                                   if p["userhost"] and p["network"] == bot.network_name]
+                    bot.set_prev_online({p["userhost"]: p["username"] for p in net_players})
                     if bot._prev_online:
                         await bot._raw(f"WHO {bot.channel}")
                         log.info(f"[{bot.network_name}] Re-login WHO sent ({len(bot._prev_online)} players)")
@@ -161,21 +165,29 @@ async def main():
     except ImportError as e:
         log.warning(f"Web server disabled ({e})")
 
-    tasks = ([asyncio.create_task(bot.run(), name=f"irc-{bot.network_name}") for bot in manager.bots]
-             + [asyncio.create_task(game_tick_loop(engine, manager, self_clock), name="game-tick")])
-    log.info(f"Multi IdleRPG running on {len(manager.bots)} network(s), self_clock={self_clock}s")
-    if getattr(engine, '_startup_broadcasts', None):
-        await asyncio.sleep(5)  # give bots a moment to connect
-        await manager.deliver_all(engine._startup_broadcasts)
-        engine._startup_broadcasts = []
-
-    loop = asyncio.get_running_loop()
+    # Signals only set an event, so a second Ctrl-C can't cut into cleanup;
+    # main() then cancels the workers once and the TaskGroup awaits them all
+    # before the DB and web server are closed.
+    loop     = asyncio.get_running_loop()
+    shutdown = asyncio.Event()
     for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, lambda: [t.cancel() for t in tasks])
+        loop.add_signal_handler(sig, shutdown.set)
     try:
-        await asyncio.gather(*tasks)
-    except asyncio.CancelledError:
-        log.info("Shutting down...")
+        async with asyncio.TaskGroup() as tg:
+            workers = [tg.create_task(bot.run(), name=f"irc-{bot.network_name}")
+                       for bot in manager.bots]
+            workers.append(tg.create_task(
+                game_tick_loop(engine, manager, self_clock), name="game-tick"))
+            log.info(f"Multi IdleRPG running on {len(manager.bots)} network(s), self_clock={self_clock}s")
+            if getattr(engine, '_startup_broadcasts', None):
+                try:
+                    await asyncio.wait_for(shutdown.wait(), 5)  # give bots a moment to connect
+                except asyncio.TimeoutError:
+                    await manager.deliver_all(engine._startup_broadcasts)
+                    engine._startup_broadcasts = []
+            await shutdown.wait()
+            log.info("Shutting down...")
+            for t in workers: t.cancel()
     finally:
         await db.close()
         if web_runner: await web_runner.cleanup()
@@ -1,47 +1,129 @@
 """web/app.py — Leaderboard, live world map, and game info page."""
-import json, time, collections
+import asyncio, gzip, html, json, time, zlib
+from array import array
 from pathlib import Path
 from aiohttp import web
 from db.database import Database
+try:
+    import orjson
+    _dumps = orjson.dumps                               # -> bytes
+except ImportError:
+    orjson = None
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+GZIP_MIN = 1024   # bytes; smaller JSON bodies aren't worth compressing
+
+def _bytes_response(req, body: bytes, content_type: str, gz: bytes | None = None,
+                    charset: str | None = None) -> web.Response:
+    """Serve an already-encoded body, gzipped when the client accepts it and
+    the body is big enough. Callers that reuse a body pass its compressed
+    form as gz so it is only compressed once."""
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= GZIP_MIN and "gzip" in req.headers.get("Accept-Encoding", ""):
+        body = gz or gzip.compress(body, 5)
+        headers["Content-Encoding"] = "gzip"
+    return web.Response(body=body, content_type=content_type, charset=charset,
+                        headers=headers)
+
+def _json_body(req, body: bytes, gz: bytes | None = None) -> web.Response:
+    # body=, not text=: the serializer already produced UTF-8 bytes
+    return _bytes_response(req, body, "application/json", gz)
+
+def _json_response(req, obj) -> web.Response:
+    return _json_body(req, _dumps(obj))
 
 # ── Real IP (Cloudflare tunnel forwards CF-Connecting-IP) ─────────────────────
 def get_ip(req) -> str:
-    return (req.headers.get("CF-Connecting-IP")
-            or req.headers.get("X-Forwarded-For", "").split(",")[0].strip()
-            or req.transport.get_extra_info("peername", ("unknown",))[0])
-
-# ── Rate limiter — sliding window, in-memory ──────────────────────────────────
+    # Runs on every request: stop at the first header present, no list split
+    headers = req.headers
+    ip = headers.get("CF-Connecting-IP")
+    if ip: return ip
+    xff = headers.get("X-Forwarded-For")
+    if xff:
+        comma = xff.find(",")
+        ip = (xff[:comma] if comma >= 0 else xff).strip()
+        if ip: return ip
+    peer = req.transport.get_extra_info("peername") if req.transport else None
+    return peer[0] if peer else "unknown"
+
+# ── Rate limiter — sliding window of per-slot counters, in-memory ─────────────
 class RateLimiter:
+    SLOTS = 60   # the window is split into at most this many counting slots
+
     def __init__(self, limit: int = 60, window: int = 60):
         """limit requests per window seconds per IP."""
-        self.limit  = limit
-        self.window = window
-        self._hits: dict[str, collections.deque] = {}
+        self.limit    = limit
+        self.window   = window
+        self.nslots   = max(1, min(self.SLOTS, int(window)))
+        self.slot_len = window / self.nslots
+        # ip -> [newest slot number, hits in window, per-slot counts]
+        self._hits: dict[str, list] = {}
+        self._next_sweep = time.monotonic() + window
+        self._headers_429 = {"Retry-After": str(int(window))}
 
     def is_allowed(self, ip: str) -> bool:
-        now    = time.monotonic()
-        dq     = self._hits.setdefault(ip, collections.deque())
-        cutoff = now - self.window
-        while dq and dq[0] < cutoff:
-            dq.popleft()
-        if len(dq) >= self.limit:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+            self._next_sweep = now + self.window
+        n    = self.nslots
+        slot = int(now / self.slot_len)
+        st   = self._hits.get(ip)
+        if st is None:
+            st = self._hits[ip] = [slot, 0, array("I", bytes(4 * n))]
+        elif slot != st[0]:
+            counts = st[2]
+            if slot - st[0] >= n:               # whole window elapsed
+                counts[:] = array("I", bytes(4 * n))
+                st[1] = 0
+            else:                               # expire only the slots rolled past
+                for s in range(st[0] + 1, slot + 1):
+                    st[1] -= counts[s % n]
+                    counts[s % n] = 0
+            st[0] = slot
+        if st[1] >= self.limit:
             return False
-        dq.append(now)
+        st[2][slot % n] += 1
+        st[1] += 1
         return True
 
+    def _sweep(self, now: float):
+        """Forget IPs with no hit inside the window, so one-off visitors and
+        scanners don't accumulate forever."""
+        slot  = int(now / self.slot_len)
+        stale = [ip for ip, st in self._hits.items() if slot - st[0] >= self.nslots]
+        for ip in stale:
+            del self._hits[ip]
+
+    BODY_429 = "Too many requests — slow down.".encode("utf-8")
+
     def response_429(self):
-        return web.Response(status=429, text="Too many requests — slow down.",
-                            content_type="text/plain")
+        # A Response can only be sent once, so only its parts are shared
+        return web.Response(status=429, body=self.BODY_429, content_type="text/plain",
+                            charset="utf-8", headers=self._headers_429)
 
 _rl = RateLimiter()  # configured in create_app() from config
 
 STATIC = Path(__file__).parent / "static"
 
+try:
+    FAVICON_BYTES = (Path(__file__).parent.parent / "favicon.svg").read_bytes()
+except OSError:
+    FAVICON_BYTES = None
+
 async def handle_favicon(req):
-    import os
-    favicon = os.path.join(os.path.dirname(__file__), "..", "favicon.svg")
-    with open(favicon, "r") as f:
-        return web.Response(text=f.read(), content_type="image/svg+xml")
+    if FAVICON_BYTES is None:
+        raise web.HTTPNotFound()
+    return web.Response(body=FAVICON_BYTES, content_type="image/svg+xml",
+                        headers={"Cache-Control": "public, max-age=86400"})
+
+async def _static_cache_headers(req, resp):
+    """/static/* (the basemap) only changes on deploy. Hooked on prepare, where
+    the status is final — a FileResponse only learns it's a 404 there — and the
+    file itself still goes out via sendfile()."""
+    if req.path.startswith("/static/") and resp.status == 200:
+        resp.headers.setdefault("Cache-Control", "public, max-age=86400")
 
 def create_app(db: Database, engine=None, networks=None, web_cfg=None) -> web.Application:
     web_cfg = web_cfg or {}
@@ -63,21 +145,32 @@ def create_app(db: Database, engine=None, networks=None, web_cfg=None) -> web.Ap
         return resp
 
     app = web.Application(middlewares=[_middleware])
+    app.on_response_prepare.append(_static_cache_headers)
     app["db"] = db
     app["engine"] = engine
     app["networks"] = networks or []
     app["hof_type"] = engine.hof_type if engine else "level"
-    app.router.add_get("/",            handle_index)
+    app["players_cache"] = {"ts": float("-inf"), "body": b"", "gz": None, "lock": asyncio.Lock()}
+    app["page_cache"] = {}   # handler -> rendered bytes, see static_page()
+    app["events_build"] = None   # in-flight /api/events build, see handle_api_events()
+    app["quest_cache"] = {"ts": float("-inf"), "body": b"", "etag": ""}
+    app["profile_cache"] = {}   # lowercased username -> (ts, body, gz), see handle_player()
+    app["quest_subscribers"] = set()   # one asyncio.Queue per open /events/quest stream
+    app.cleanup_ctx.append(_quest_publisher)
+    app.on_shutdown.append(_close_quest_streams)
+    app.router.add_get("/",            static_page(handle_index))
     app.router.add_get("/favicon.svg",   handle_favicon)
+    app.router.add_get("/assets/{name}", handle_asset)
     app.router.add_get("/map",         handle_map)
-    app.router.add_get("/info",        handle_info)
-    app.router.add_get("/admin",       handle_admin)
-    app.router.add_get("/quest",       handle_quest)
+    app.router.add_get("/info",        static_page(handle_info))
+    app.router.add_get("/admin",       static_page(handle_admin))
+    app.router.add_get("/quest",       static_page(handle_quest))
     app.router.add_get("/player/{username}", handle_player)
-    app.router.add_get("/play",        handle_play)
+    app.router.add_get("/play",        static_page(handle_play))
     if (engine and engine.hof_type != "none"):
         app.router.add_get("/hof",         handle_hof)
     app.router.add_get("/api/quest",   handle_api_quest)
+    app.router.add_get("/events/quest", handle_quest_events)
     app.router.add_get("/api/players", handle_api_players)
     app.router.add_get("/api/events",  handle_api_events)
     if STATIC.exists():
@@ -117,28 +210,85 @@ nav a:hover{color:var(--gold)}
 .container{max-width:1100px;margin:2rem auto;padding:0 1.5rem}
 """
 
+# Stylesheets shared across pages are served from memory under a content-hash
+# URL, so browsers can keep them forever and a deploy still picks up changes.
+ASSETS: dict[str, tuple[bytes, bytes, str]] = {}   # name -> (body, gzip, content type)
+
+def _asset(name: str, text: str, content_type: str) -> str:
+    """Register an asset and return its versioned URL."""
+    body = text.encode("utf-8")
+    ASSETS[name] = (body, gzip.compress(body, 9), content_type)
+    return f"/assets/{name}?v={zlib.crc32(body):08x}"
+
+async def handle_asset(req):
+    entry = ASSETS.get(req.match_info["name"])
+    if entry is None:
+        raise web.HTTPNotFound()
+    resp = _bytes_response(req, entry[0], entry[2], entry[1], charset="utf-8")
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+def _stylesheet(url: str) -> str:
+    return f'<link rel="stylesheet" href="{url}">'
+
+SHELL_CSS = _stylesheet(_asset("shell.css", COMMON_CSS, "text/css"))
+
 def page(title, body, extra_css="", extra_head="", show_hof=True):
+    style = f"<style>{extra_css}</style>" if extra_css else ""
     return f"""<!DOCTYPE html><html lang="en">
 <head><meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1"><link rel="icon" type="image/svg+xml" href="/favicon.svg"><title>Multi IdleRPG — {title}</title>
-<style>{COMMON_CSS}{extra_css}</style>{extra_head}</head>
+{SHELL_CSS}{style}{extra_head}</head>
 <body>
 <header><h1>⚔ Multi IdleRPG ⚔</h1><p>The ancient art of doing absolutely nothing</p></header>
 {make_nav(show_hof)}
 {body}
 </body></html>"""
 
+STATIC_PAGE_MAX_AGE = 300   # seconds; short, as a restart may change the config behind them
+
+def static_page(handler):
+    """Wrap a page handler whose HTML depends only on startup config (engine
+    settings, networks, hof_type): render it on first hit, then serve the
+    encoded bytes (and a gzip of them, compressed hard once since it is
+    reused for every visitor) from app["page_cache"] for the life of the app.
+    Browsers may reuse them too, for STATIC_PAGE_MAX_AGE."""
+    async def cached(req):
+        pages = req.app["page_cache"]
+        entry = pages.get(handler)
+        if entry is None:
+            body  = (await handler(req)).body
+            entry = pages[handler] = (body, gzip.compress(body, 9))
+        resp = _bytes_response(req, entry[0], "text/html", entry[1], charset="utf-8")
+        resp.headers["Cache-Control"] = f"public, max-age={STATIC_PAGE_MAX_AGE}"
+        return resp
+    return cached
+
 def _show_hof(req) -> bool:
     """Return True if HoF is enabled (not hof_type=none)."""
     return req.app.get("hof_type", "level") != "none"
 
 # ── API ───────────────────────────────────────────────────────────────────────
 
+PLAYERS_TTL = 2.0   # seconds one serialized /api/players body is reused
+
 async def handle_api_players(req):
-    db = req.app["db"]
-    players = await db.get_all_players()
+    # Polled every 5-10s by every open leaderboard and map: serve the cached
+    # body, and let only one request rebuild it when it has gone stale.
+    cache = req.app["players_cache"]
+    if time.monotonic() - cache["ts"] >= PLAYERS_TTL:
+        async with cache["lock"]:
+            if time.monotonic() - cache["ts"] >= PLAYERS_TTL:
+                cache["body"] = body = await _players_json(req.app["db"])
+                cache["gz"]   = gzip.compress(body, 5) if len(body) >= GZIP_MIN else None
+                cache["ts"]   = time.monotonic()
+    return _json_body(req, cache["body"], cache["gz"])
+
+async def _players_json(db) -> bytes:
+    # Independent reads: the reader pool runs them side by side
+    players, sums = await asyncio.gather(
+        db.get_all_players(), db.get_item_sums())     # one GROUP BY for every player
     data = []
     for p in players:
-        isum = await db.get_item_sum(p["id"])
         data.append({
             "username":  p["username"],
             "network":   p["network"],
@@ -149,37 +299,27 @@ async def handle_api_players(req):
             "y":         p["pos_y"],
             "is_online": bool(p["is_online"]),
             "ttl":       p["ttl"],
-            "item_sum":  isum,
+            "item_sum":  sums.get(p["id"], 0),
         })
-    return web.Response(text=json.dumps(data), content_type="application/json")
+    return _dumps(data)
 
 async def handle_api_events(req):
-    db = req.app["db"]
+    # Requests that arrive while a build is in flight await that build instead
+    # of each running the query and serialization. shield(): one client
+    # disconnecting must not cancel the others' result.
+    task = req.app["events_build"]
+    if task is None or task.done():
+        task = req.app["events_build"] = asyncio.ensure_future(_events_json(req.app["db"]))
+    return _json_body(req, await asyncio.shield(task))
+
+async def _events_json(db) -> bytes:
     events = await db.get_recent_events(50)
-    data = [{"type": e["event_type"], "message": e["message"],
-             "ts": e["created_at"]} for e in events]
-    return web.Response(text=json.dumps(data), content_type="application/json")
+    return _dumps([{"type": t, "message": m, "ts": ts} for t, m, ts in events])
 
 # ── Leaderboard ───────────────────────────────────────────────────────────────
 
 async def handle_index(req):
-    db = req.app["db"]
-    current_round = await db.get_round()
-    players = await db.get_all_players()
-    rows = ""
-    for p in players:
-        isum   = await db.get_item_sum(p["id"])
-        amap   = {"g": "good", "e": "evil", "n": "neutral"}
-        status = "🟢" if p["is_online"] else "⚫"
-        s      = abs(int(p["ttl"]))
-        d, s   = divmod(s, 86400); h, s = divmod(s, 3600); m, s = divmod(s, 60)
-        ttl_s  = f"{d}d {h:02d}:{m:02d}:{s:02d}"
-        rows += f"""<tr>
-          <td>{status} <a href="/player/{p['username']}">{p['username']}</a></td><td>{p['network']}</td>
-          <td>{p['level']}</td><td>{p['class']}</td>
-          <td>{amap.get(p['alignment'],'neutral')}</td>
-          <td>{ttl_s}</td><td>{isum}</td>
-        </tr>"""
+    # The table is filled client-side from /api/players; nothing to query here
     css = """
 table{width:100%;border-collapse:collapse;background:var(--panel);
       border:1px solid var(--border);border-radius:4px;overflow:hidden}
@@ -202,6 +342,8 @@ tr:last-child td{border-bottom:none}
   <tbody id="lb-body"><tr><td colspan="7" style="text-align:center;color:var(--muted)">Loading...</td></tr></tbody>
 </table></div></div>
 <script>
+// Names and classes are whatever players typed on IRC
+const esc = s => String(s).replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'})[c]);
 const AMAP = {g:'good', e:'evil', n:'neutral'};
 function fmtTTL(s) {
   s = Math.abs(Math.round(s));
@@ -216,10 +358,10 @@ async function refreshLeaderboard() {
     const tbody = document.getElementById('lb-body');
     tbody.innerHTML = players.map(p => `
       <tr>
-        <td>${p.is_online ? '🟢' : '⚫'} <a href="/player/${p.username}">${p.username}</a></td>
-        <td>${p.network}</td>
+        <td>${p.is_online ? '🟢' : '⚫'} <a href="/player/${encodeURIComponent(p.username)}">${esc(p.username)}</a></td>
+        <td>${esc(p.network)}</td>
         <td>${p.level}</td>
-        <td>${p.char_class}</td>
+        <td>${esc(p.char_class)}</td>
         <td>${AMAP[p.alignment] || 'neutral'}</td>
         <td>${fmtTTL(p.ttl)}</td>
         <td>${p.item_sum}</td>
@@ -259,6 +401,10 @@ MAP_REGIONS = [
     for i in range(16)
 ]
 
+# Static map data, serialized once for every /map page
+REGIONS_JS    = json.dumps(MAP_REGIONS)
+GRID_ZONES_JS = json.dumps(GRID_ZONES)
+
 def nearest_landmark(x, y):
     col = min(int(x // 125), 3)
     row = min(int(y // 125), 3)
@@ -266,8 +412,6 @@ def nearest_landmark(x, y):
 
 
 async def handle_map(req):
-    regions_js    = json.dumps(MAP_REGIONS)
-    grid_zones_js = json.dumps(GRID_ZONES)
     current_round = await req.app["db"].get_round()
     css = """
 body{overflow:hidden;height:100vh;display:flex;flex-direction:column}
@@ -319,14 +463,36 @@ canvas{border:1px solid var(--border);border-radius:4px;display:block;
 </div>
 <div id="tooltip"></div>
 <script>
+const esc = s => String(s).replace(/[&<>"']/g, c => ({{'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}})[c]);
 const canvas    = document.getElementById('map');
 const ctx       = canvas.getContext('2d');
 const W = 500, H = 500;
 let players = [];
+let offlinePlayers = [], onlinePlayers = [];   // partitioned once per fetch
+
+// Hover hit-testing: players bucketed into HIT_R-sized cells, rebuilt per
+// fetch, so a mousemove checks a 3x3 block of cells instead of every player.
+const HIT_R = 8, HIT_N = Math.ceil(W / HIT_R);
+let hitGrid = new Map();
+function cellKey(cx, cy) {{ return cy * HIT_N + cx; }}
+function playerAt(mx, my) {{
+  const cx = Math.floor(mx / HIT_R), cy = Math.floor(my / HIT_R);
+  let best = null;
+  for (let dy = -1; dy <= 1; dy++) for (let dx = -1; dx <= 1; dx++) {{
+    const bucket = hitGrid.get(cellKey(cx + dx, cy + dy));
+    if (!bucket) continue;
+    for (const p of bucket) {{
+      const ex = p.x - mx, ey = p.y - my;
+      // first match in list order wins, as with players.find()
+      if (ex*ex + ey*ey < HIT_R*HIT_R && (!best || p._i < best._i)) best = p;
+    }}
+  }}
+  return best;
+}}
 
 // ── Region data ─────────────────────────────────────────────────────────────
-const REGIONS = {regions_js};
-const GRID_ZONES = {grid_zones_js};
+const REGIONS = {REGIONS_JS};
+const GRID_ZONES = {GRID_ZONES_JS};
 
 // ── Load map image as background ──────────────────────────────────────────────
 const off = document.createElement('canvas'); off.width=W; off.height=H;
@@ -363,18 +529,25 @@ function draw() {{
   if (!drawReady) return;
   ctx.drawImage(off, 0, 0);
   // Offline first (behind online)
-  for (const p of players.filter(p => !p.is_online)) drawDot(ctx, p.x, p.y, false);
+  for (const p of offlinePlayers) drawDot(ctx, p.x, p.y, false);
   // Online on top
-  for (const p of players.filter(p =>  p.is_online)) drawDot(ctx, p.x, p.y, true);
+  for (const p of onlinePlayers)  drawDot(ctx, p.x, p.y, true);
 }}
 
 // ── Data refresh ──────────────────────────────────────────────────────────────
 async function fetchPlayers() {{
   try {{
     players = await (await fetch('/api/players')).json();
-    const n = players.filter(p => p.is_online).length;
+    offlinePlayers = []; onlinePlayers = []; hitGrid = new Map();
+    players.forEach((p, i) => {{
+      (p.is_online ? onlinePlayers : offlinePlayers).push(p);
+      p._i = i;
+      const k = cellKey(Math.floor(p.x / HIT_R), Math.floor(p.y / HIT_R));
+      const bucket = hitGrid.get(k);
+      if (bucket) bucket.push(p); else hitGrid.set(k, [p]);
+    }});
     document.getElementById('status-bar').textContent =
-      `${{n}} online · ${{players.length}} total`;
+      `${{onlinePlayers.length}} online · ${{players.length}} total`;
     draw();
   }} catch(e) {{ document.getElementById('status-bar').textContent = 'Connection error'; }}
 }}
@@ -395,7 +568,7 @@ canvas.addEventListener('mousemove', e => {{
   const r  = canvas.getBoundingClientRect();
   const mx = (e.clientX - r.left) * (W / r.width);
   const my = (e.clientY - r.top)  * (H / r.height);
-  const hit    = players.find(p => Math.hypot(p.x - mx, p.y - my) < 8);
+  const hit    = playerAt(mx, my);
   const region = regionAt(mx, my);
   const locLine = region
     ? `<span class="region-name">${{region}}</span>`
@@ -403,8 +576,8 @@ canvas.addEventListener('mousemove', e => {{
 
   if (hit) {{
     hoverEl.innerHTML =
-      `<b>${{hit.username}}</b> @${{hit.network}}<br>` +
-      `Lv.${{hit.level}} ${{hit.char_class}}<br>` +
+      `<b>${{esc(hit.username)}}</b> @${{esc(hit.network)}}<br>` +
+      `Lv.${{hit.level}} ${{esc(hit.char_class)}}<br>` +
       `[${{hit.x}}, ${{hit.y}}] · ${{hit.is_online ? '🟢' : '🔴'}}<br>` +
       locLine;
     tooltip.style.cssText = `display:block;left:${{e.clientX+14}}px;top:${{e.clientY-10}}px`;
@@ -753,12 +926,89 @@ The player will need to log in again with the new name.</p>
 
 # ── Quest API ─────────────────────────────────────────────────────────────────
 
+QUEST_TTL = 1.0   # seconds; time_left is whole seconds, so polls within one share a body
+
 async def handle_api_quest(req):
-    engine = req.app.get("engine")
+    # Every open quest page polls this. One body per second is serialized and
+    # tagged; a poller whose copy is still current gets a bodiless 304.
+    cache = req.app["quest_cache"]
+    now   = time.monotonic()
+    if now - cache["ts"] >= QUEST_TTL:
+        body = _dumps(_quest_data(req.app.get("engine")))
+        cache.update(ts=now, body=body, etag=f'"{zlib.crc32(body):08x}"')
+    headers = {"ETag": cache["etag"], "Cache-Control": "no-cache"}
+    if req.headers.get("If-None-Match") == cache["etag"]:
+        return web.Response(status=304, headers=headers)
+    resp = _json_body(req, cache["body"])
+    resp.headers.update(headers)
+    return resp
+
+QUEST_PUSH_EVERY = 1.0    # seconds between checks for a quest change
+QUEST_KEEPALIVE  = 30.0   # idle seconds before a comment line keeps proxies from closing the stream
+QUEST_BACKLOG    = 8      # undelivered updates kept per subscriber; older ones are dropped
+
+async def handle_quest_events(req):
+    """Server-sent events for the quest page: the current quest at once, then a
+    new one only when it changes (see _publish_quest). The countdown runs in
+    the browser, so nothing is sent while a quest just ticks down."""
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream",
+                                       "Cache-Control": "no-cache"})
+    await resp.prepare(req)
+    subs  = req.app["quest_subscribers"]
+    queue = asyncio.Queue(QUEST_BACKLOG)
+    subs.add(queue)
+    try:
+        await resp.write(b"data: " + _dumps(_quest_data(req.app.get("engine"))) + b"\n\n")
+        while True:
+            try:
+                msg = await asyncio.wait_for(queue.get(), QUEST_KEEPALIVE)
+            except asyncio.TimeoutError:
+                msg = b":\n\n"
+            if msg is None:   # app shutting down
+                break
+            await resp.write(msg)
+    except ConnectionResetError:
+        pass
+    finally:
+        subs.discard(queue)
+    return resp
+
+def _push(queue, msg):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(msg)
+
+async def _publish_quest(app):
+    # One check for all subscribers: compare the payload without time_left,
+    # which changes every second but is counted down client-side.
+    last = None
+    while True:
+        await asyncio.sleep(QUEST_PUSH_EVERY)
+        data  = _quest_data(app.get("engine"))
+        state = {k: v for k, v in data.items() if k != "time_left"}
+        if state != last:
+            last = state
+            msg  = b"data: " + _dumps(data) + b"\n\n"
+            for queue in app["quest_subscribers"]:
+                _push(queue, msg)
+
+async def _quest_publisher(app):
+    task = asyncio.create_task(_publish_quest(app))
+    yield
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+async def _close_quest_streams(app):
+    # Open event streams would otherwise hold up shutdown until they time out
+    for queue in app["quest_subscribers"]:
+        _push(queue, None)
+
+def _quest_data(engine) -> dict:
     if not engine:
-        return web.Response(text=json.dumps({"active": False}),
-                            content_type="application/json")
-    import time
+        return {"active": False}
     q   = engine._quest
     now = int(time.time())
     if not q["questers"]:
@@ -783,12 +1033,12 @@ async def handle_api_quest(req):
             "target":   target,
             "questers": [{"username": x["username"], "network": x["network"],
                           "level": x["level"], "char_class": x["class"],
-                          "x": x.get("pos_x", 0), "y": x.get("pos_y", 0)}
+                          "x": x["pos_x"], "y": x["pos_y"]}
                          for x in q["questers"]],
             "p1name": f"{q.get('p1name', '')} [{target[0]}, {target[1]}]".strip(),
             "p2name": f"{q.get('p2name', '')} [{q['p2'][0]}, {q['p2'][1]}]".strip() if q.get('p2') else "",
         }
-    return web.Response(text=json.dumps(data), content_type="application/json")
+    return data
 
 
 # ── Quest page ────────────────────────────────────────────────────────────────
@@ -837,6 +1087,7 @@ async def handle_quest(req):
   </div>
 </div>
 <script>
+const esc = s => String(s).replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'})[c]);
 function fmtTime(s) {
   if (s <= 0) return '00:00:00';
   const d = Math.floor(s / 86400);
@@ -889,8 +1140,8 @@ function renderQuest(q) {
     <div class="quester">
       <div class="quester-num">${i+1}</div>
       <div class="quester-info">
-        <b>${p.username}<span class="tag">${p.network}</span></b>
-        <span>Level ${p.level} ${p.char_class}${q.type==='grid' ? ` · [${p.x}, ${p.y}]` : ''}</span>
+        <b>${esc(p.username)}<span class="tag">${esc(p.network)}</span></b>
+        <span>Level ${p.level} ${esc(p.char_class)}${q.type==='grid' ? ` · [${p.x}, ${p.y}]` : ''}</span>
       </div>
     </div>`).join('');
 
@@ -928,8 +1179,13 @@ async function fetchQuest() {
   }
 }
 
-fetchQuest();
-setInterval(fetchQuest, 15000);
+// Pushed on change where supported; EventSource reconnects by itself
+if (window.EventSource) {
+  new EventSource('/events/quest').onmessage = e => renderQuest(JSON.parse(e.data));
+} else {
+  fetchQuest();
+  setInterval(fetchQuest, 15000);
+}
 </script>"""
 
     return web.Response(text=page("Quest", body, css, show_hof=_show_hof(req)),
@@ -1024,53 +1280,10 @@ SLOT_LABEL = {
     "buckler":"Buckler","coat":"Coat","cutlass":"Cutlass",
 }
 
-async def handle_player(req):
-    import time as _time, datetime
-    db       = req.app["db"]
-    username = req.match_info["username"]
-    p        = await db.get_player_any_network(username)
-    if not p:
-        body = f'<div class="container" style="padding:2rem"><p>Player <b>{username}</b> not found. <a href="/" style="color:var(--gold)">Back to leaderboard</a></p></div>'
-        return web.Response(text=page("Not Found", body, show_hof=_show_hof(req)), content_type="text/html")
-
-    items  = {r["slot"]: r for r in await db.get_items(p["id"])}
-    isum   = sum(r["level"] for r in items.values())
-
-    def fmt_ts(ts):
-        if not ts: return "—"
-        return datetime.datetime.utcfromtimestamp(ts).strftime("%a %-d %b %Y at %H:%M:%S UTC")
-
-    def fmt_ttl(s):
-        s = abs(int(s))
-        d, s = divmod(s, 86400); h, s = divmod(s, 3600); m, s = divmod(s, 60)
-        return f"{d} days, {h:02d}:{m:02d}:{s:02d}"
-
-    def fmt_pen(s):
-        return fmt_ttl(s) if s else "None"
-
-    amap      = {"g":"Good","e":"Evil","n":"Neutral"}
-    status    = "Online" if p["is_online"] else "Offline"
-    alignment = amap.get(p["alignment"],"Neutral")
-    total_pen = (p["pen_mesg"]+p["pen_nick"]+p["pen_part"]+
-                 p["pen_kick"]+p["pen_quit"]+p["pen_quest"]+p["pen_logout"])
-
-    def row(label, value, cls=""):
-        return f'<tr><th>{label}</th><td class="{cls}">{value}</td></tr>'
-
-    def item_row(slot):
-        r     = items.get(slot)
-        label = SLOT_LABEL.get(slot, slot.title())
-        if not r or r["level"] == 0:
-            return f'<tr><th>{label}</th><td class="muted">—</td></tr>'
-        name  = f' <span class="iname">({r["name"]})</span>' if r.get("name") else ""
-        return f'<tr><th>{label}</th><td><span class="ilvl">{r["level"]}</span>{name}</td></tr>'
-
-    def pen_row(label, val):
-        if not val:
-            return f'<tr><th>{label}</th><td class="muted">None</td></tr>'
-        return f'<tr><th>{label}</th><td class="pen">{fmt_pen(val)}</td></tr>'
-
-    css = """
+# Same for every profile, so it is a cached asset rather than inline. The map
+# is the basemap image with the player's dot and name laid over it in CSS,
+# positioned in percent of the 500x500 world.
+_PLAYER_CSS = """
 .pw{max-width:960px;margin:2rem auto;padding:0 1.5rem 3rem}
 .pname{font-family:'Cinzel',serif;color:var(--gold);font-size:1.3rem;
         letter-spacing:0.08em;margin-bottom:0.3rem}
@@ -1095,38 +1308,142 @@ tr:last-child th,tr:last-child td{border-bottom:none}
 .pen{color:#c0854a;font-family:monospace;font-size:0.85rem}
 .pen-total{color:var(--text);font-family:monospace;font-size:0.85rem;font-weight:600}
 .map-pad{padding:0.6rem;background:#0a0c10}
-/* Canvas always 500x500 internally; CSS scales it to fill the card */
-#mm{display:block;width:100%;height:auto;border-radius:2px}
+.mm{position:relative;contain:content}
+.mm img{display:block;width:100%;height:auto;border-radius:2px}
+.dot{position:absolute;width:24px;height:24px;margin:-12px 0 0 -12px;border-radius:50%;
+     background:radial-gradient(circle,rgba(255,68,204,0.85),rgba(255,68,204,0) 70%)}
+.dot::after{content:"";position:absolute;left:7px;top:7px;width:7px;height:7px;border-radius:50%;
+            background:#ff99ee;border:1.5px solid #ff44cc}
+.lbl{position:absolute;padding:0 5px;background:rgba(0,0,0,0.82);color:#ffccee;
+     font:bold 0.95rem/1.3 sans-serif;white-space:nowrap;pointer-events:none}
 """
+_PLAYER_CSS_LINK = _stylesheet(_asset("profile.css", _PLAYER_CSS, "text/css"))
+
+_ALIGNMENTS = {"g": "Good", "e": "Evil", "n": "Neutral"}
+_PEN_COLS    = (("Kick", "pen_kick"), ("Logout", "pen_logout"), ("Message", "pen_mesg"),
+                ("Nick", "pen_nick"), ("Part", "pen_part"), ("Quest", "pen_quest"),
+                ("Quit", "pen_quit"))
+# (key, row prefix, whole row when empty): the label markup is fixed per row,
+# so only the value is formatted per render
+_ITEM_ROWS = tuple((slot, f'<tr><th>{SLOT_LABEL[slot]}</th><td>',
+                    f'<tr><th>{SLOT_LABEL[slot]}</th><td class="muted">—</td></tr>')
+                   for slot in ITEM_SLOTS)
+_PEN_ROWS  = tuple((col, f'<tr><th>{label}</th><td class="pen">',
+                    f'<tr><th>{label}</th><td class="muted">None</td></tr>')
+                   for label, col in _PEN_COLS)
+
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS   = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+             "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def _fmt_ts(ts):
+    # time.gmtime is one C call; no datetime object, no strftime format parsing,
+    # and no locale dependence for the day and month names
+    if not ts: return "—"
+    t = time.gmtime(ts)
+    return (f"{_WEEKDAYS[t.tm_wday]} {t.tm_mday} {_MONTHS[t.tm_mon - 1]} {t.tm_year} "
+            f"at {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d} UTC")
+
+_ZERO_TTL = "0 days, 00:00:00"
+
+def _fmt_ttl(s):
+    if not s: return _ZERO_TTL   # most penalty columns, and every new account's idled
+    s = abs(int(s))
+    d, s = divmod(s, 86400); h, s = divmod(s, 3600); m, s = divmod(s, 60)
+    return f"{d} days, {h:02d}:{m:02d}:{s:02d}"
+
+def _fmt_pen(s):
+    return _fmt_ttl(s) if s else "None"
+
+def _row(label, value, cls=""):
+    return f'<tr><th>{label}</th><td class="{cls}">{value}</td></tr>'
+
+def _items_html(items):
+    parts = []
+    for slot, prefix, empty in _ITEM_ROWS:
+        r = items.get(slot)
+        if not r or not r["level"]:
+            parts.append(empty)
+            continue
+        name = f' <span class="iname">({html.escape(r["name"])})</span>' if r["name"] else ""
+        parts.append(f'{prefix}<span class="ilvl">{r["level"]}</span>{name}</td></tr>')
+    return "".join(parts)
+
+def _label_shift(px, py):
+    # Name sits above the dot, or below it near the top edge; near a side it is
+    # anchored to that side instead of centred so it stays on the map.
+    x = "-6px" if px < 60 else "calc(-100% + 6px)" if px > 440 else "-50%"
+    y = "calc(-100% - 10px)" if py > 24 else "10px"
+    return f"translate({x},{y})"
+
+def _pens_html(p):
+    return "".join(f"{prefix}{_fmt_ttl(p[col])}</td></tr>" if p[col] else empty
+                   for col, prefix, empty in _PEN_ROWS)
+
+PROFILE_TTL = 5.0   # seconds a rendered profile page is reused
+PROFILE_MAX = 512   # cached profiles before stale entries are swept
+
+async def handle_player(req):
+    # Refreshes and crawlers hit the same few profiles: reuse the rendered
+    # page (and its gzip) for PROFILE_TTL instead of re-querying and re-rendering.
+    username = req.match_info["username"]
+    key      = username.lower()
+    cache    = req.app["profile_cache"]
+    now      = time.monotonic()
+    entry    = cache.get(key)
+    if entry is None or now - entry[0] >= PROFILE_TTL:
+        body = await _player_page(req, username)
+        if body is None:
+            nf = f'<div class="container" style="padding:2rem"><p>Player <b>{html.escape(username)}</b> not found. <a href="/" style="color:var(--gold)">Back to leaderboard</a></p></div>'
+            return web.Response(text=page("Not Found", nf, show_hof=_show_hof(req)), content_type="text/html")
+        if len(cache) >= PROFILE_MAX:
+            for k in [k for k, e in cache.items() if now - e[0] >= PROFILE_TTL]:
+                del cache[k]
+        entry = cache[key] = (now, body, gzip.compress(body, 5) if len(body) >= GZIP_MIN else None)
+    return _bytes_response(req, entry[1], "text/html", entry[2], charset="utf-8")
+
+async def _player_page(req, username) -> bytes | None:
+    p, items = await req.app["db"].get_player_with_items(username)
+    if not p:
+        return None
 
-    px, py = p["pos_x"], p["pos_y"]
+    # Usernames, classes, hosts and item names all come from IRC users
+    name      = html.escape(p["username"])
+    px, py    = p["pos_x"], p["pos_y"]
+    isum      = sum(r["level"] for r in items.values())
+    total_pen = sum(p[col] for col, _, _ in _PEN_ROWS)
+    online    = "online" if p["is_online"] else "offline"
 
     body = f"""<div class="pw">
-  <div class="pname">{p['username']}</div>
-  <div class="psub">{p['class']} &middot; {p['network']}</div>
+  <div class="pname">{name}</div>
+  <div class="psub">{html.escape(p['class'])} &middot; {html.escape(p['network'])}</div>
 
   <div class="ptop">
     <div class="card">
       <div class="ct">Character</div>
       <table>
-        {row('User', p['username'])}
-        {row('Class', p['class'])}
-        {row('Level', p['level'])}
-        {row('Next Level', fmt_ttl(p['ttl']))}
-        {row('Status', '<span class="' + ('online' if p['is_online'] else 'offline') + '">' + status + '</span>')}
-        {row('Host', '<span style="font-size:0.78rem;word-break:break-all">' + (p['userhost'] or '—') + '</span>')}
-        {row('Account Created', fmt_ts(p['created_at']))}
-        {row('Last Login', fmt_ts(p['last_login']))}
-        {row('Total Idled', fmt_ttl(p['idled']))}
-        {row('Position', f"{px}, {py}")}
-        {row('Alignment', alignment)}
-        {row('Item Sum', isum)}
+        {_row('User', name)}
+        {_row('Class', html.escape(p['class']))}
+        {_row('Level', p['level'])}
+        {_row('Next Level', _fmt_ttl(p['ttl']))}
+        {_row('Status', f'<span class="{online}">{online.title()}</span>')}
+        {_row('Host', '<span style="font-size:0.78rem;word-break:break-all">' + html.escape(p['userhost'] or '—') + '</span>')}
+        {_row('Account Created', _fmt_ts(p['created_at']))}
+        {_row('Last Login', _fmt_ts(p['last_login']))}
+        {_row('Total Idled', _fmt_ttl(p['idled']))}
+        {_row('Position', f"{px}, {py}")}
+        {_row('Alignment', _ALIGNMENTS.get(p['alignment'], 'Neutral'))}
+        {_row('Item Sum', isum)}
       </table>
     </div>
     <div class="card">
       <div class="ct">Map — [{px}, {py}]</div>
       <div class="map-pad">
-        <canvas id="mm" width="500" height="500"></canvas>
+        <div class="mm">
+          <img src="/static/map.png" width="500" height="500" alt="World map">
+          <div class="dot" style="left:{px / 5:g}%;top:{py / 5:g}%"></div>
+          <div class="lbl" style="left:{px / 5:g}%;top:{py / 5:g}%;transform:{_label_shift(px, py)}">{name}</div>
+        </div>
       </div>
     </div>
   </div>
@@ -1134,67 +1451,23 @@ tr:last-child th,tr:last-child td{border-bottom:none}
   <div class="pbot">
     <div class="card">
       <div class="ct">Items</div>
-      <table>{''.join(item_row(s) for s in ITEM_SLOTS)}</table>
+      <table>{_items_html(items)}</table>
     </div>
     <div class="card">
       <div class="ct">Penalties</div>
       <table>
-        {pen_row('Kick', p['pen_kick'])}
-        {pen_row('Logout', p['pen_logout'])}
-        {pen_row('Message', p['pen_mesg'])}
-        {pen_row('Nick', p['pen_nick'])}
-        {pen_row('Part', p['pen_part'])}
-        {pen_row('Quest', p['pen_quest'])}
-        {pen_row('Quit', p['pen_quit'])}
-        {row('Total', '<span class="' + ('pen-total' if total_pen else 'muted') + '">' + fmt_pen(total_pen) + '</span>')}
+        {_pens_html(p)}
+        {_row('Total', '<span class="' + ('pen-total' if total_pen else 'muted') + '">' + _fmt_pen(total_pen) + '</span>')}
       </table>
     </div>
   </div>
 </div>
 
-<script>
-const cv=document.getElementById('mm');
-const ctx=cv.getContext('2d');
-const W=500,H=500;
-const PX={px},PY={py};
-
-// Load pirate map image as background
-const mapImg = new Image();
-mapImg.src = '/static/map.png';
-mapImg.onload = () => {{
-  ctx.drawImage(mapImg, 0, 0, W, H);
-  drawDot();
-}};
-
-function drawDot() {{
-// Player dot — glowing magenta
-const g2=ctx.createRadialGradient(PX,PY,0,PX,PY,12);
-g2.addColorStop(0,'rgba(255,68,204,0.85)');
-g2.addColorStop(1,'rgba(255,68,204,0)');
-ctx.beginPath();ctx.arc(PX,PY,12,0,Math.PI*2);
-ctx.fillStyle=g2;ctx.fill();
-ctx.beginPath();ctx.arc(PX,PY,4,0,Math.PI*2);
-ctx.fillStyle='#ff99ee';ctx.fill();
-ctx.strokeStyle='#ff44cc';ctx.lineWidth=1.5;ctx.stroke();
-
-// Name label — large, readable, with background box
-const lbl='{p['username']}';
-ctx.font='bold 16px sans-serif';
-ctx.textAlign='center';
-const lw=ctx.measureText(lbl).width;
-// Clamp label so it never goes off edge
-const lx=Math.min(Math.max(PX,lw/2+6),W-lw/2-6);
-const ly=PY>24?PY-12:PY+26;
-ctx.fillStyle='rgba(0,0,0,0.82)';
-ctx.fillRect(lx-lw/2-5,ly-15,lw+10,20);
-ctx.fillStyle='#ffccee';
-ctx.fillText(lbl,lx,ly);
-}}
-</script>
 """
 
-    return web.Response(text=page(f"{p['username']} — Profile", body, css, show_hof=_show_hof(req)),
-                        content_type="text/html")
+    html_out = page(f"{name} — Profile", body, extra_head=_PLAYER_CSS_LINK,
+                    show_hof=_show_hof(req))
+    return html_out.encode("utf-8")
 
 
 # ── Hall of Fame ──────────────────────────────────────────────────────────────
@@ -1227,12 +1500,11 @@ def _next_cron_str(expr: str) -> str:
 async def handle_hof(req):
     import datetime
     db      = req.app["db"]
-    entries = await db.get_hof()
+    entries, current_round = await asyncio.gather(db.get_hof(), db.get_round())
     engine     = req.app.get("engine")
     hof_type   = engine.hof_type  if engine else "level"
     win_level  = engine.win_level if engine else 40
     round_cron = engine.round_cron if engine else ""
-    current_round = await db.get_round()
 
     medals = {1: "🥇", 2: "🥈", 3: "🥉"}
     css = """
@@ -1286,8 +1558,8 @@ async def handle_hof(req):
                 body_parts.append(f'''<div class="hof-card">
   <div class="medal">{medal}</div>
   <div>
-    <div class="hof-name">{w['username']}</div>
-    <div class="hof-detail">{w['class']} · {w['network']} · Level {w['level']} · Item Sum {w['item_sum']}</div>
+    <div class="hof-name">{html.escape(w['username'])}</div>
+    <div class="hof-detail">{html.escape(w['class'])} · {html.escape(w['network'])} · Level {w['level']} · Item Sum {w['item_sum']}</div>
   </div>
   <div class="hof-meta">{date}</div>
 </div>''')